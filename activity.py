@@ -0,0 +1,69 @@
+"""
+怪物活动调度：按房间和距离把怪物分成三档，只模拟玩家附近的怪物
+  唤醒：玩家所在房间的怪物，以及还有小点在飞的怪物，每帧完整更新
+  附近：玩家周围 near_radius 像素内的其他怪物，降频只更新待机动画
+  休眠：其余怪物，不做任何更新
+每帧的开销只与玩家附近的怪物数量有关，与地图大小无关
+"""
+
+# 附近档的半径（像素），约一个屏幕
+NEAR_RADIUS = 640
+# 附近档每隔多少帧更新一次
+NEAR_TICK_INTERVAL = 4
+
+
+class ActivityScheduler:
+    """按玩家所在房间唤醒怪物，用空间哈希找出附近需要降频更新的怪物"""
+
+    def __init__(self, monster_hash, near_radius=NEAR_RADIUS, near_interval=NEAR_TICK_INTERVAL):
+        self.monster_hash = monster_hash
+        self.near_radius = near_radius
+        self.near_interval = max(1, near_interval)
+        # 房间编号 -> 该房间的怪物
+        self._by_room = {}
+        # 唤醒的怪物（dict 当有序集合，更新顺序与生成顺序一致）
+        self._awake = {}
+        # 怪物 -> 降频更新的相位，把附近档的更新均匀分散到各帧
+        self._phase = {}
+        self._frame = 0
+
+    def add(self, monster):
+        """登记新生成的怪物（初始为休眠）"""
+        self._by_room.setdefault(monster.room_index, []).append(monster)
+        self._phase[monster] = len(self._phase) % self.near_interval
+
+    def remove(self, monster):
+        """移除死亡的怪物"""
+        room_monsters = self._by_room.get(monster.room_index)
+        if room_monsters and monster in room_monsters:
+            room_monsters.remove(monster)
+        self._awake.pop(monster, None)
+        self._phase.pop(monster, None)
+
+    def wake_room(self, room_index):
+        """玩家进入房间时唤醒该房间的所有怪物"""
+        for monster in self._by_room.get(room_index, []):
+            self._awake[monster] = None
+
+    def sleep(self, monster):
+        """怪物不再需要每帧更新时转入休眠"""
+        self._awake.pop(monster, None)
+
+    @property
+    def awake_count(self):
+        return len(self._awake)
+
+    def schedule(self, player_x, player_y):
+        """
+        返回本帧的 (完整更新列表, 降频更新列表, 降频步数)
+        降频列表只包含本帧轮到的附近怪物
+        """
+        self._frame += 1
+        awake = list(self._awake)
+
+        slot = self._frame % self.near_interval
+        r = self.near_radius
+        nearby = self.monster_hash.query_rect(player_x - r, player_y - r, player_x + r, player_y + r)
+        reduced = [m for m in nearby
+                   if m not in self._awake and self._phase.get(m) == slot]
+        return awake, reduced, self.near_interval
@@ -0,0 +1,276 @@
+"""
+性能基准：固定种子、无界面地测量各热点路径的耗时，结果输出为 JSON，
+并可与基线结果对比，判断改动是变快还是变慢
+
+测量项目：
+    generate_dungeon    不同地图尺寸
+    Map.render          不同屏幕分辨率（相机沿固定路线平移）
+    GameEngine.update   玩家房间中 10 / 100 / 1000 个怪物
+    load_monster_gifs / load_sprites   资源加载
+
+用法示例：
+    python benchmark.py -o baseline.json
+    python benchmark.py -o current.json --baseline baseline.json
+    python benchmark.py --filter render --repeat 500
+    python benchmark.py --compare baseline.json current.json --fail-threshold 0.15
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import io
+import json
+import math
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import headless  # 设置 SDL dummy 驱动，需在 pygame 之前导入
+import numpy as np
+import pygame
+
+from game_engine import GameEngine, SIM_STEP_MS
+from level_pool import SeededLevels
+from map import Map, TILE_SIZE, generate_dungeon
+from monster_loader import MonsterLoader
+from sprite_loader import SpriteLoader
+
+BENCHMARK_SEED = 20240601
+DUNGEON_SIZES = ((60, 40), (120, 80), (240, 160))
+RENDER_RESOLUTIONS = ((800, 600), (1280, 720), (1920, 1080))
+RENDER_MAP_SIZE = (240, 160)
+MONSTER_COUNTS = (10, 100, 1000)
+# 变化超过该比例才算变快/变慢（计时抖动以内视为持平）
+DEFAULT_THRESHOLD = 0.10
+
+
+# ---------------- 计时 ----------------
+
+def measure(func, repeat, warmup=0, number=1):
+    """
+    先调用 warmup 次，再采样 repeat 次，每次采样连续调用 number 次；
+    返回每次调用耗时（毫秒）的统计；与 timeit 一样计时期间关闭垃圾回收
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start) * 1000 / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_ms": samples[0],
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(math.ceil(len(samples) * 0.95)) - 1)],
+        "stdev_ms": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+# ---------------- 测量项目：每项返回 measure() 的结果 ----------------
+
+def bench_generate_dungeon(width, height, repeat, seed=BENCHMARK_SEED):
+    """每次采样用依次递增的种子生成一张地图"""
+    seeds = iter(range(seed, seed + repeat + 2))
+
+    def run():
+        generate_dungeon(width, height, rng=random.Random(next(seeds)))
+
+    return measure(run, repeat, warmup=2)
+
+
+def bench_map_render(resolution, repeat, seed=BENCHMARK_SEED, map_size=RENDER_MAP_SIZE):
+    """相机沿李萨如曲线平移（速度与玩家相近），同时覆盖块缓存的命中与换入"""
+    game_map = Map(*map_size, rng=random.Random(seed))
+    screen = pygame.Surface(resolution).convert()
+    range_x = max(game_map.width * TILE_SIZE - resolution[0], 0) / 2
+    range_y = max(game_map.height * TILE_SIZE - resolution[1], 0) / 2
+    frame = [0]
+
+    def run():
+        t = frame[0] * 0.002
+        frame[0] += 1
+        game_map.render(screen, range_x * (1 + math.sin(3 * t)), range_y * (1 + math.sin(2 * t)))
+
+    return measure(run, repeat, warmup=60)
+
+
+def create_engine(loaders, seed=BENCHMARK_SEED, monsters=0):
+    """
+    固定种子的 GameEngine；额外在玩家所在房间生成 monsters 个怪物并唤醒，
+    玩家不会死亡，怪物持续追击和发射小点（最重的战斗场景）
+    """
+    screen = headless.init_headless()
+    engine = GameEngine(screen, pygame.font.Font(None, 24), level_pool=SeededLevels(seed),
+                        input_source=headless.ScriptedInput(), **loaders)
+    engine.player.current_health = 10 ** 9
+    # 起点在房间中心，player_room 总是有效的房间编号
+    room = engine.map.rooms[engine.player_room]
+    rng = random.Random(seed)
+    types = engine.monster_types() if monsters else []
+    for _ in range(monsters):
+        engine.spawn_monster(rng.choice(types), room)
+    engine.activity.wake_room(engine.player_room)
+    return engine
+
+
+def bench_engine_update(loaders, monsters, repeat, seed=BENCHMARK_SEED):
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = create_engine(loaders, seed, monsters)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = measure(lambda: engine.update(SIM_STEP_MS), repeat, warmup=60)
+    result["state"] = engine.state
+    return result
+
+
+def bench_load_monster_gifs(repeat):
+    return measure(lambda: MonsterLoader().load_monster_gifs(), repeat)
+
+
+def bench_load_sprites(repeat):
+    return measure(lambda: SpriteLoader().load_sprites(), repeat)
+
+
+def benchmark_cases(loaders, repeat, load_repeat):
+    """(名称, 调用) 列表，名称用于过滤和与基线对比"""
+    cases = []
+    for width, height in DUNGEON_SIZES:
+        cases.append((f"generate_dungeon/{width}x{height}",
+                      lambda w=width, h=height: bench_generate_dungeon(w, h, max(repeat // 10, 5))))
+    for resolution in RENDER_RESOLUTIONS:
+        cases.append((f"map_render/{resolution[0]}x{resolution[1]}",
+                      lambda r=resolution: bench_map_render(r, repeat)))
+    for count in MONSTER_COUNTS:
+        cases.append((f"engine_update/{count}_monsters",
+                      lambda n=count: bench_engine_update(loaders, n, repeat)))
+    cases.append(("load_monster_gifs", lambda: bench_load_monster_gifs(load_repeat)))
+    cases.append(("load_sprites", lambda: bench_load_sprites(load_repeat)))
+    return cases
+
+
+# ---------------- 运行与对比 ----------------
+
+def environment_info():
+    """记录运行环境，对比不同机器上的结果时参考"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def run_benchmarks(repeat=300, load_repeat=3, name_filter=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaders = headless.load_resources()
+    results = {}
+    for name, run in benchmark_cases(loaders, repeat, load_repeat):
+        if name_filter and name_filter not in name:
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = run()
+        print(f"{name:<32} 中位数 {results[name]['median_ms']:9.3f} ms  "
+              f"p95 {results[name]['p95_ms']:9.3f} ms", file=sys.stderr)
+    return {"seed": BENCHMARK_SEED, "environment": environment_info(), "results": results}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """按中位数对比两份结果，返回 [(名称, 基线, 当前, 变化比例, 结论)]"""
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, result in current.get("results", {}).items():
+        base = base_results.get(name)
+        if base is None:
+            rows.append((name, None, result["median_ms"], None, "新增"))
+            continue
+        change = result["median_ms"] / base["median_ms"] - 1 if base["median_ms"] > 0 else 0.0
+        if change > threshold:
+            verdict = "变慢"
+        elif change < -threshold:
+            verdict = "变快"
+        else:
+            verdict = "持平"
+        rows.append((name, base["median_ms"], result["median_ms"], change, verdict))
+    return rows
+
+
+def print_comparison(rows, out=sys.stdout):
+    print(f"{'项目':<32}{'基线 ms':>12}{'当前 ms':>12}{'变化':>10}  结论", file=out)
+    for name, base, current, change, verdict in rows:
+        base_text = f"{base:12.3f}" if base is not None else f"{'-':>12}"
+        change_text = f"{change:+10.1%}" if change is not None else f"{'-':>10}"
+        print(f"{name:<32}{base_text}{current:12.3f}{change_text}  {verdict}", file=out)
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="固定种子的无界面性能基准")
+    parser.add_argument("--repeat", type=int, default=300, help="每个项目的采样次数（地图生成为其 1/10）")
+    parser.add_argument("--load-repeat", type=int, default=3, help="资源加载的采样次数")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的项目")
+    parser.add_argument("-o", "--output", default="-", help="输出 JSON 文件（默认标准输出）")
+    parser.add_argument("--baseline", help="与该基线结果对比")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="只对比两份已有结果，不运行基准")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="变化超过该比例才算变快/变慢")
+    parser.add_argument("--fail-threshold", type=float,
+                        help="任一项目变慢超过该比例时以状态码 1 退出（CI 用）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        baseline, current = (load_results(path) for path in args.compare)
+    else:
+        current = run_benchmarks(args.repeat, args.load_repeat, args.filter)
+        out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            json.dump(current, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        baseline = load_results(args.baseline) if args.baseline else None
+
+    failed = False
+    if baseline is not None:
+        rows = compare(baseline, current, args.threshold)
+        # 输出 JSON 到标准输出时，对比表写到标准错误
+        print_comparison(rows, sys.stdout if args.compare or args.output != "-" else sys.stderr)
+        if args.fail_threshold is not None:
+            failed = any(change is not None and change > args.fail_threshold
+                         for _, _, _, change, _ in rows)
+    pygame.quit()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -169,13 +169,12 @@ class Player:
                     self.current_frame = 0
 
     def draw(self, screen, screen_x, screen_y):
-        """绘制角色（原有代码不变，自动适配闪避动画帧）"""
+        """绘制角色（原有代码不变，自动适配闪避动画帧）；返回绘制覆盖的区域"""
         if not self.animation_frames:
-            pygame.draw.circle(screen, (255, 0, 0), (int(screen_x), int(screen_y)), self.radius)
-            return
+            return pygame.draw.circle(screen, (255, 0, 0), (int(screen_x), int(screen_y)), self.radius)
         draw_frame = min(self.current_frame, len(self.animation_frames) - 1)
         if draw_frame < 0 or draw_frame >= len(self.animation_frames):
-            return
+            return None
         current_sprite = self.animation_frames[draw_frame]
         # 左方向翻转（原有代码不变）
         if self.direction == "left":
@@ -196,6 +195,9 @@ class Player:
         pygame.draw.rect(screen, (0, 255, 0),
                          (screen_x - health_bar_width // 2, screen_y - 30,
                           health_bar_width * health_ratio, health_bar_height))
+        # 返回精灵与血条（前景不超过背景宽度）的外接矩形
+        return sprite_rect.union((int(screen_x) - health_bar_width // 2 - 1, int(screen_y) - 31,
+                                  health_bar_width + 2, health_bar_height + 2))
 
     # ------------------- 新增：关联地图碰撞检测（关键） -------------------
     def set_map_reference(self, map_instance):
@@ -0,0 +1,66 @@
+"""
+脏矩形提交：相机不动时地图画面不变，只把本帧和上一帧绘制过实体、HUD 的区域
+用 pygame.display.update(rects) 提交到窗口；相机移动、换关或脏区域过多时
+退回一次完整的 pygame.display.flip()
+
+每帧仍然完整绘制到屏幕表面，省下的只是提交（拷贝到窗口）的开销
+"""
+import pygame
+
+# 脏矩形超过该数量时直接整屏提交（逐个提交反而更慢）
+MAX_DIRTY_RECTS = 64
+# 脏区域面积之和超过屏幕面积的该比例时整屏提交
+MAX_DIRTY_COVERAGE = 0.5
+
+
+class DirtyRegions:
+    """记录上一帧的绘制区域和视图，决定本帧是局部提交还是整屏提交"""
+
+    def __init__(self, max_rects=MAX_DIRTY_RECTS, max_coverage=MAX_DIRTY_COVERAGE):
+        self.max_rects = max_rects
+        self.max_coverage = max_coverage
+        self._last_rects = None
+        self._last_view = None
+        # 统计：局部提交 / 整屏提交的帧数
+        self.partial_frames = 0
+        self.full_frames = 0
+
+    def reset(self):
+        """下一帧强制整屏提交（切换界面、窗口尺寸变化等）"""
+        self._last_rects = None
+        self._last_view = None
+
+    def present(self, screen, rects, view):
+        """
+        提交一帧：rects 为本帧绘制过的区域（None 表示整屏都变了），
+        view 为决定背景内容的视图（如地图和相机位置），与上一帧不同时整屏提交
+        返回是否整屏提交
+        """
+        dirty = None
+        if rects is not None and self._last_rects is not None and view == self._last_view:
+            dirty = self._collect(screen, self._last_rects + rects)
+        self._last_rects = rects
+        self._last_view = view if rects is not None else None
+
+        if dirty is None:
+            pygame.display.flip()
+            self.full_frames += 1
+            return True
+        if dirty:
+            pygame.display.update(dirty)
+        self.partial_frames += 1
+        return False
+
+    def _collect(self, screen, rects):
+        """裁剪到屏幕内并去掉空矩形；太多或太大时返回 None（整屏提交）"""
+        bounds = screen.get_rect()
+        dirty = []
+        area = 0
+        for rect in rects:
+            rect = bounds.clip(rect)
+            if rect.width and rect.height:
+                dirty.append(rect)
+                area += rect.width * rect.height
+        if len(dirty) > self.max_rects or area > bounds.width * bounds.height * self.max_coverage:
+            return None
+        return dirty
@@ -0,0 +1,173 @@
+"""
+批量地牢生成统计（多进程）
+
+用法示例：
+    python dungeon_stats.py --count 2000 --width 120 --height 80 --format csv -o stats.csv
+
+对每个种子统计：生成耗时、房间数、连通性、起点到终点的路径长度、
+死胡同数量，以及 Map 抛出 RuntimeError 的失败率，输出 JSON 或 CSV
+种子与游戏、headless.py --seed 和回放使用的关卡种子一致
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# 工作进程导入 pygame 时不打印欢迎信息
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from map import Map, TILE_EMPTY, TILE_SIZE, bfs_distance_field, label_regions
+from rng_streams import RngStreams
+
+CSV_FIELDS = [
+    "seed", "ok", "error", "generation_ms", "rooms", "connected",
+    "path_length", "dead_ends"
+]
+
+
+def count_dead_ends(game_map):
+    """统计房间外只有不超过一个相邻地板的走廊格"""
+    floor = game_map.tiles == TILE_EMPTY
+    neighbors = np.zeros(floor.shape, dtype=np.int8)
+    neighbors[1:, :] += floor[:-1, :]
+    neighbors[:-1, :] += floor[1:, :]
+    neighbors[:, 1:] += floor[:, :-1]
+    neighbors[:, :-1] += floor[:, 1:]
+    return int(np.count_nonzero(floor & (game_map.room_index < 0) & (neighbors <= 1)))
+
+
+def room_graph_connected(game_map):
+    """房间连接图是否连通"""
+    if not game_map.rooms:
+        return False
+    seen = {0}
+    stack = [0]
+    while stack:
+        for other in game_map.room_graph[stack.pop()]:
+            if other not in seen:
+                seen.add(other)
+                stack.append(other)
+    return len(seen) == len(game_map.rooms)
+
+
+def measure_seed(seed, width, height, generation_options):
+    """生成一个地牢并统计指标（在工作进程中运行）"""
+    from level_pool import plan_level
+
+    result = {"seed": seed, "ok": False, "error": "", "generation_ms": 0.0,
+              "rooms": 0, "connected": False, "path_length": -1, "dead_ends": 0}
+    # 与 generate_level 相同的 "map" 随机数流：同一种子可直接用 headless.py --seed 或回放复现
+    rng = RngStreams(seed).stream("map")
+    # 生成过程的日志输出对统计没有意义
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        try:
+            game_map = Map(width, height, rng=rng, **generation_options)
+        except RuntimeError as e:
+            result["generation_ms"] = (time.perf_counter() - start) * 1000
+            result["error"] = str(e)
+            return result
+        result["generation_ms"] = (time.perf_counter() - start) * 1000
+        level = plan_level(game_map)
+
+    _, floor_regions = label_regions(game_map.tiles == TILE_EMPTY)
+    result["ok"] = True
+    result["rooms"] = len(game_map.rooms)
+    result["connected"] = floor_regions == 1 and room_graph_connected(game_map)
+    result["dead_ends"] = count_dead_ends(game_map)
+
+    # 起点到终点的真实步行距离（格）
+    start_tile = (int(level.start_room[0] // TILE_SIZE), int(level.start_room[1] // TILE_SIZE))
+    goal_x, goal_y = int(level.end_room[0] // TILE_SIZE), int(level.end_room[1] // TILE_SIZE)
+    if 0 <= goal_x < game_map.width and 0 <= goal_y < game_map.height:
+        distances = bfs_distance_field(game_map.tiles, [start_tile])
+        result["path_length"] = int(distances[goal_y, goal_x])
+    return result
+
+
+def _measure_args(args):
+    return measure_seed(*args)
+
+
+def summarize(results):
+    """汇总所有种子的统计"""
+    ok = [r for r in results if r["ok"]]
+    times = np.array([r["generation_ms"] for r in results]) if results else np.zeros(1)
+    paths = np.array([r["path_length"] for r in ok if r["path_length"] >= 0])
+    summary = {
+        "count": len(results),
+        "failures": len(results) - len(ok),
+        "failure_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "generation_ms_mean": float(times.mean()),
+        "generation_ms_p50": float(np.percentile(times, 50)),
+        "generation_ms_p95": float(np.percentile(times, 95)),
+        "rooms_mean": float(np.mean([r["rooms"] for r in ok])) if ok else 0.0,
+        "connected_rate": sum(r["connected"] for r in ok) / len(ok) if ok else 0.0,
+        "unreachable_goals": sum(1 for r in ok if r["path_length"] < 0),
+        "path_length_mean": float(paths.mean()) if paths.size else 0.0,
+        "path_length_min": int(paths.min()) if paths.size else 0,
+        "path_length_max": int(paths.max()) if paths.size else 0,
+        "dead_ends_mean": float(np.mean([r["dead_ends"] for r in ok])) if ok else 0.0
+    }
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="多进程批量生成地牢并统计质量指标")
+    parser.add_argument("--count", type=int, default=100, help="生成的地牢数量")
+    parser.add_argument("--start-seed", type=int, default=0, help="起始随机种子")
+    parser.add_argument("--width", type=int, default=120, help="地图宽度（格）")
+    parser.add_argument("--height", type=int, default=80, help="地图高度（格）")
+    parser.add_argument("--density", type=float, default=0.7, help="每个房间容器生成房间的概率")
+    parser.add_argument("--rooms-min", type=int, default=6, help="最少房间数")
+    parser.add_argument("--rooms-max", type=int, default=None, help="最多房间数")
+    parser.add_argument("--loop-edges", type=int, default=0, help="生成树之外额外连接的走廊数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数")
+    parser.add_argument("--format", choices=["json", "csv"], default="json", help="输出格式")
+    parser.add_argument("-o", "--output", default="-", help="输出文件（默认标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    generation_options = {"density": args.density, "rooms_min": args.rooms_min,
+                          "rooms_max": args.rooms_max, "loop_edges": args.loop_edges}
+    jobs = [(seed, args.width, args.height, generation_options)
+            for seed in range(args.start_seed, args.start_seed + args.count)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(_measure_args, jobs, chunksize=max(1, len(jobs) // (args.workers * 8))))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results)
+    summary["wall_time_s"] = elapsed
+    summary["workers"] = args.workers
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        if args.format == "json":
+            json.dump({"summary": summary, "seeds": results}, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        else:
+            writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+            # CSV 只包含逐种子数据，汇总写到标准错误
+            print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"完成 {summary['count']} 个种子，失败率 {summary['failure_rate']:.2%}，"
+          f"耗时 {elapsed:.2f}s（{args.workers} 进程）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
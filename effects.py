@@ -0,0 +1,152 @@
+"""
+程序化特效帧缓存：终点标记、受击闪光、出生标记等特效在首次使用时
+按参数预渲染成 N 帧，绘制时只按经过的时间取一帧 blit 一次，
+不再每帧计算三角函数并调用 pygame.draw
+
+新增特效：写一个 paint(surface, t_ms, duration_ms, **params) 函数（以表面中心为原点
+绘制 t_ms 时刻的画面），在 EFFECTS 中登记尺寸、时长、是否循环和帧数即可
+"""
+import math
+
+import pygame
+
+GOLD = (255, 215, 0)
+YELLOW = (255, 255, 0)
+ORANGE = (255, 100, 0)
+WHITE = (255, 255, 255)
+
+# 终点标记：脉动 |sin(0.003t)| 的周期为 π/3 秒，八条光线旋转 (0.002t) 每 π/8 秒重合，
+# 两者的公共周期正好是 π 秒
+GOAL_MARKER_PERIOD_MS = 1000 * math.pi
+
+
+# ---------------- 特效绘制函数 ----------------
+
+def paint_goal_marker(surface, t_ms, duration_ms):
+    """脉动的金色圆环、旋转的八条光线和中心圆点"""
+    cx, cy = surface.get_width() // 2, surface.get_height() // 2
+    pulse = abs(math.sin(t_ms * 0.003)) * 0.5 + 0.5
+    outer_radius = int(20 + pulse * 8)
+    pygame.draw.circle(surface, GOLD, (cx, cy), outer_radius, 2)
+
+    angle = t_ms * 0.002
+    for i in range(8):
+        a = angle + i * math.pi / 4
+        x1 = cx + math.cos(a) * 15
+        y1 = cy + math.sin(a) * 15
+        x2 = cx + math.cos(a) * 8
+        y2 = cy + math.sin(a) * 8
+        pygame.draw.line(surface, YELLOW, (int(x1), int(y1)), (int(x2), int(y2)), 2)
+
+    pygame.draw.circle(surface, GOLD, (cx, cy), 6)
+    pygame.draw.circle(surface, ORANGE, (cx, cy), 3)
+
+
+def paint_hit_flash(surface, t_ms, duration_ms, color=WHITE):
+    """受击闪光：向外扩散并淡出的圆环"""
+    cx, cy = surface.get_width() // 2, surface.get_height() // 2
+    progress = min(t_ms / duration_ms, 1.0)
+    radius = int(6 + progress * (cx - 8))
+    alpha = int(255 * (1.0 - progress))
+    pygame.draw.circle(surface, (*color, alpha), (cx, cy), radius, 3)
+    if progress < 0.4:
+        pygame.draw.circle(surface, (*color, alpha // 2), (cx, cy), int(radius * 0.6))
+
+
+def paint_spawn_marker(surface, t_ms, duration_ms, color=(170, 80, 255)):
+    """出生标记：向内收缩的圆环和四个角标"""
+    cx, cy = surface.get_width() // 2, surface.get_height() // 2
+    progress = min(t_ms / duration_ms, 1.0)
+    radius = int((cx - 2) * (1.0 - progress * 0.7))
+    alpha = int(255 * (1.0 - progress ** 2))
+    pygame.draw.circle(surface, (*color, alpha), (cx, cy), radius, 2)
+    for i in range(4):
+        a = i * math.pi / 2 + progress * math.pi / 2
+        x = cx + math.cos(a) * radius
+        y = cy + math.sin(a) * radius
+        pygame.draw.circle(surface, (*color, alpha), (int(x), int(y)), 3)
+
+
+class EffectSpec:
+    """特效的登记信息：绘制函数、帧尺寸（正方形边长）、时长、是否循环、帧数"""
+
+    def __init__(self, paint, size, duration_ms, loop, frames):
+        self.paint = paint
+        self.size = size
+        self.duration_ms = duration_ms
+        self.loop = loop
+        self.frames = frames
+
+
+EFFECTS = {
+    "goal_marker": EffectSpec(paint_goal_marker, 64, GOAL_MARKER_PERIOD_MS, True, 180),
+    "hit_flash": EffectSpec(paint_hit_flash, 48, 200, False, 12),
+    "spawn_marker": EffectSpec(paint_spawn_marker, 64, 400, False, 24),
+}
+
+
+# ---------------- 预渲染与绘制 ----------------
+
+class BakedEffect:
+    """预渲染好的特效帧序列"""
+
+    def __init__(self, frames, duration_ms, loop):
+        self.frames = frames
+        self.duration_ms = duration_ms
+        self.loop = loop
+        self.half_size = frames[0].get_width() // 2
+
+    def frame_at(self, elapsed_ms):
+        """经过 elapsed_ms 时的帧；一次性特效播放完毕后返回 None"""
+        if self.loop:
+            elapsed_ms %= self.duration_ms
+        elif elapsed_ms >= self.duration_ms or elapsed_ms < 0:
+            return None
+        index = int(elapsed_ms * len(self.frames) / self.duration_ms)
+        return self.frames[min(index, len(self.frames) - 1)]
+
+    def finished(self, elapsed_ms):
+        return not self.loop and elapsed_ms >= self.duration_ms
+
+    def draw(self, screen, x, y, elapsed_ms):
+        """以 (x, y) 为中心绘制当前帧，返回绘制区域（没有可画的帧时为 None）"""
+        frame = self.frame_at(elapsed_ms)
+        if frame is None:
+            return None
+        rect = pygame.Rect(int(x) - self.half_size, int(y) - self.half_size,
+                           frame.get_width(), frame.get_height())
+        screen.blit(frame, rect)
+        return rect
+
+
+def bake(spec, **params):
+    """按 spec 把特效渲染成 spec.frames 帧（每帧取所在时间片的起点时刻）"""
+    frames = []
+    for i in range(spec.frames):
+        surface = pygame.Surface((spec.size, spec.size), pygame.SRCALPHA)
+        spec.paint(surface, i * spec.duration_ms / spec.frames, spec.duration_ms, **params)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        frames.append(surface)
+    return BakedEffect(frames, spec.duration_ms, spec.loop)
+
+
+class EffectCache:
+    """按 (特效名, 参数) 缓存预渲染的帧序列，首次使用时渲染"""
+
+    def __init__(self, effects=None):
+        self.effects = EFFECTS if effects is None else effects
+        self._baked = {}
+
+    def get(self, name, **params):
+        key = (name, tuple(sorted(params.items())))
+        baked = self._baked.get(key)
+        if baked is None:
+            baked = bake(self.effects[name], **params)
+            self._baked[key] = baked
+        return baked
+
+    def preload(self, *names):
+        """提前渲染默认参数的特效（主程序启动时调用，避免开始游戏或第一次出现时卡顿）"""
+        for name in names:
+            self.get(name)
@@ -1,15 +1,22 @@
 import pygame
 import sys
-import random
-import math
-from collections import deque
-from map import Map, TILE_EMPTY, TILE_WALL, TILE_STAIRS
+import numpy as np
 from character import Player
 from sprite_loader import SpriteLoader
 # game_engine.py 顶部添加导入
 from monster import Monster
 from monster_loader import MonsterLoader
-from map import TILE_EMPTY, TILE_WALL, TILE_STAIRS, TILE_SIZE
+from level_pool import generate_level
+from navigation import NavigationService
+from map import TILE_SIZE
+from spatial_hash import SpatialHash
+from activity import ActivityScheduler
+from monster_store import MonsterStore
+from projectiles import ProjectileSystem
+from rng_streams import RngStreams, new_seed
+from profiler import FrameProfiler
+from text_cache import TextCache
+from effects import EffectCache
 
 # 颜色定义
 GOLD = (255, 215, 0)
@@ -20,24 +27,102 @@ WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255,0,0)
 
+# 固定模拟步长（毫秒）：移动速度、怪物速度和小点速度都按每步计算
+SIM_HZ = 60
+SIM_STEP_MS = 1000 / SIM_HZ
+# 每关开始时的模拟时间（毫秒），冷却计时从这里起算
+SIM_START_MS = 10000
+# 怪物绘制裁剪的外扩边距（像素）：半个精灵加血条
+MONSTER_DRAW_MARGIN = 40
+
+# 每个模拟步的输入编码为一个字节：低 4 位为按住的移动键，高位为本步按下的动作键
+INPUT_UP = 1
+INPUT_LEFT = 2
+INPUT_DOWN = 4
+INPUT_RIGHT = 8
+INPUT_ATTACK = 16
+INPUT_EVADE = 32
+INPUT_RESTART = 64
+HELD_KEY_INPUTS = {pygame.K_w: INPUT_UP, pygame.K_a: INPUT_LEFT,
+                   pygame.K_s: INPUT_DOWN, pygame.K_d: INPUT_RIGHT}
+ACTION_KEY_INPUTS = {pygame.K_j: INPUT_ATTACK, pygame.K_k: INPUT_EVADE, pygame.K_r: INPUT_RESTART}
+
 class GameEngine:
-    def __init__(self, screen, font):
+    def __init__(self, screen, font, level_pool=None, sprite_loader=None, monster_loader=None,
+                 input_source=None, recorder=None, replay=None, profiler=None, text_cache=None,
+                 effect_cache=None):
         self.screen = screen
         self.font = font
-        self.clock = pygame.time.Clock()
-        self.FPS = 60
-        self.state = "game"
-        self.victory = False
+        # 文字缓存（可复用主程序同一字体的缓存）：HUD 数字由字形图集拼出
+        self.text = text_cache if text_cache is not None else TextCache(font)
+        # 预渲染的特效帧（可复用主程序的缓存，新游戏时不再重新渲染）
+        self.effects = effect_cache if effect_cache is not None else EffectCache()
+        self.goal_marker = self.effects.get("goal_marker")
+        self.hit_flash = self.effects.get("hit_flash")
+        self.player_hit_flash = self.effects.get("hit_flash", color=RED)
+        self.spawn_marker = self.effects.get("spawn_marker")
+        # 输入来源：为空时读取键盘，无界面运行时由程序提供按键状态
+        self.input_source = input_source
+        # 输入录制（replay.InputRecorder）与回放（replay.Replay），回放时忽略实时输入
+        self.recorder = recorder
+        self.replay = replay
+        # 分阶段耗时统计（profiler.FrameProfiler），未开启时不计时
+        self.profiler = profiler if profiler is not None else FrameProfiler()
+        # 已按下、等待下一个模拟步处理的动作键
+        self._pending_inputs = 0
         self.move_speed = 5
+        self.attack_sound = None  # 接收主程序传递的攻击音效
 
-        # 精灵加载器
-        self.sprite_loader = SpriteLoader()
-        print("开始加载精灵资源...")
-        self.sprite_loader.load_sprites()
+        # 关卡池（为空时同步生成关卡）
+        self.level_pool = level_pool
+
+        # 精灵加载器（可复用已加载的实例，重开时不再重新加载）
+        if sprite_loader is None:
+            sprite_loader = SpriteLoader()
+            print("开始加载精灵资源...")
+            sprite_loader.load_sprites()
+        self.sprite_loader = sprite_loader
+
+        # 怪物加载器
+        if monster_loader is None:
+            print("开始加载怪物资源...")
+            monster_loader = MonsterLoader()
+            monster_loader.load_monster_gifs()  # 加载所有怪物GIF
+        self.monster_loader = monster_loader
+
+        self.load_level(self._next_level())
+
+    def _next_level(self):
+        """从关卡池取出预生成的关卡（回放时按录像的种子重新生成）"""
+        if self.replay is not None:
+            return self.replay.next_level(self)
+        if self.level_pool is not None:
+            return self.level_pool.get()
+        return generate_level()
+
+    def restart(self):
+        """换上下一个预生成的关卡重新开始"""
+        try:
+            level = self._next_level()
+        except Exception as e:
+            print(f"地图生成失败，重试: {e}")
+            level = generate_level()
+        self.load_level(level)
+
+    def load_level(self, level):
+        """用预生成的关卡重置本局状态"""
+        if self.recorder is not None:
+            self.recorder.begin_level(self, level)
+        self.state = "game"
+        self.victory = False
+        # 模拟时钟（毫秒）：每个模拟步推进 dt，冷却计时都以它为准，暂停时不走
+        self.sim_time = SIM_START_MS
+        # 子系统随机数流（由关卡种子派生，保证回放一致）
+        self.rng = RngStreams(level.seed if level.seed is not None else new_seed())
 
         # 玩家、地图初始化
         self.player = Player("勇者", self.sprite_loader)
-        self.map = Map(120, 80)
+        self.map = level.map
         self.player.x, self.player.y = self.map.player_position
 
         # 让玩家能用于闪避碰撞检测
@@ -49,153 +134,141 @@ class GameEngine:
         self.last_damage_time = 0  # 新增这一行
 
         self.last_attack_sound_time = 0
-        self.attack_sound = None  # 接收主程序传递的攻击音效
 
-        # 起点/终点选择逻辑（不改动）
-        if len(self.room_centers) >= 2:
-            self.start_room = self._find_closest_room_center(self.player.x, self.player.y)
-            farthest_room, path_distance = self._find_farthest_room_by_path(
-                (self.player.x, self.player.y)
-            )
-
-            if farthest_room and farthest_room != self.start_room:
-                self.end_room = farthest_room
-                print(f"终点设置完成 - 路径距离: {int(path_distance)}")
-            else:
-                max_distance = -1
-                self.end_room = self.start_room
-                for center in self.room_centers:
-                    if center != self.start_room:
-                        dist = self._manhattan_dist(self.start_room, center)
-                        if dist > max_distance:
-                            max_distance = dist
-                            self.end_room = center
-                print("使用空间距离回退方案")
-        else:
-            self.start_room = (self.player.x, self.player.y)
-            self.end_room = (self.player.x + 300, self.player.y + 300)
+        # 正在播放的一次性特效：(特效, 世界坐标 x, y, 开始时的模拟时间)
+        self.active_effects = []
+
+        # 玩家当前所在房间编号（-1 表示走廊），跨越房间边界时派发事件
+        self.player_room = self.map.room_at(self.player.x, self.player.y)
+
+        # 起点/终点（已在关卡生成时选好）
+        self.start_room = level.start_room
+        self.end_room = level.end_room
 
-        # 相机初始化
+        # 共享距离场：终点距离与怪物追击
+        self.navigation = NavigationService(self.map)
+        self.navigation.set_goal(*self.end_room)
+        self.navigation.update_player(self.player.x, self.player.y)
+
+        # 相机初始化（prev_camera 为上一模拟步的相机，用于渲染插值）
         self.camera_x = self.player.x - self.screen.get_width() // 2
         self.camera_y = self.player.y - self.screen.get_height() // 2
+        self.prev_camera = (self.camera_x, self.camera_y)
 
         print(f"起点: {self.start_room}, 终点: {self.end_room}, 房间数: {len(self.room_centers)}")
 
         # ---------------- 怪物系统初始化 ----------------
-        print("开始加载怪物资源...")
-        self.monster_loader = MonsterLoader()
-        self.monster_loader.load_monster_gifs()  # 加载所有怪物GIF
         self.monsters = []  # 存储所有怪物实例
-
-        # 修改 game_engine.py 中怪物生成部分（约第95-110行）
-        # 为每个房间创建一个随机怪物（跳过起点和终点房间）
-        for room in self.map.rooms:
-            # 计算房间中心像素坐标
-            room_center = (
-                room["x"] + room["width"] // 2,
-                room["y"] + room["height"] // 2
-            )
-            room_center_pixel = (
-                room_center[0] * TILE_SIZE + TILE_SIZE // 2,
-                room_center[1] * TILE_SIZE + TILE_SIZE // 2
-            )
-
-            # 跳过起点附近和终点房间的怪物生成
-            is_start_room = self._manhattan_dist(room_center_pixel, self.start_room) < 100
-            is_end_room = self._manhattan_dist(room_center_pixel, self.end_room) < 100
-
-            if is_start_room or is_end_room:
-                continue  # 跳过起点和终点房间
-
+        self.monster_views = []  # 按 MonsterStore 行号索引的怪物（死亡的行由 alive 屏蔽）
+        # 结构数组存储：怪物和小点的状态，按批量向量运算更新
+        self.monster_store = MonsterStore()
+        # 全局小点池：所有远程怪物发射的小点
+        self.projectiles = ProjectileSystem()
+        # 空间哈希：碰撞和攻击判定只查询玩家附近的怪物
+        self.monster_hash = SpatialHash()
+        # 活动调度：只有玩家附近的怪物参与每帧模拟
+        self.activity = ActivityScheduler(self.monster_hash)
+
+        # 按关卡的生成表为每个房间创建一个随机怪物
+        for room in level.spawn_rooms:
             # 随机选择怪物类型
-            monster_type = self.monster_loader.get_random_monster_type()
+            monster_type = self.monster_loader.get_random_monster_type(self.rng.stream("spawn"))
             if monster_type:
-                monster = Monster(
-                    monster_type=monster_type,
-                    monster_loader=self.monster_loader,
-                    room=room,
-                    map_instance=self.map
-                )
-                self.monsters.append(monster)
-                print(f"生成怪物：{monster_type}（房间中心：{room_center_pixel}）")
+                self._spawn_monster(monster_type, room)
+        if self.player_room >= 0:
+            self.activity.wake_room(self.player_room)
         print(f"怪物生成完成，共 {len(self.monsters)} 个怪物")
 
-    # ---------------- 路径计算 ----------------
-
-    def _find_farthest_room_by_path(self, start_pos):
-        if not self.room_centers or len(self.room_centers) < 2:
-            return None, 0
-
-        start_room = self._find_closest_room_center(start_pos[0], start_pos[1])
-
-        visited = {start_room: 0}
-        queue = deque([(start_room, 0)])
-
-        max_distance = 0
-        farthest_room = start_room
-
-        while queue:
-            current_room, current_dist = queue.popleft()
-
-            for room_center in self.room_centers:
-                if room_center not in visited:
-                    if self._rooms_connected(current_room, room_center):
-                        path_dist = current_dist + self._manhattan_dist(current_room, room_center)
-                        visited[room_center] = path_dist
-                        queue.append((room_center, path_dist))
-
-                        if path_dist > max_distance:
-                            max_distance = path_dist
-                            farthest_room = room_center
-
-        return farthest_room, max_distance
-
-    def _rooms_connected(self, room1, room2):
-        from map import TILE_SIZE
-
-        x1, y1 = int(room1[0] // TILE_SIZE), int(room1[1] // TILE_SIZE)
-        x2, y2 = int(room2[0] // TILE_SIZE), int(room2[1] // TILE_SIZE)
-
-        if not (0 <= x1 < self.map.width and 0 <= y1 < self.map.height):
-            return False
-        if not (0 <= x2 < self.map.width and 0 <= y2 < self.map.height):
-            return False
-
-        visited = set()
-        queue = deque([(x1, y1)])
-        visited.add((x1, y1))
-
-        max_steps = 1000
-        steps = 0
-
-        while queue and steps < max_steps:
-            x, y = queue.popleft()
-            steps += 1
-
-            if x == x2 and y == y2:
-                return True
-
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                nx, ny = x + dx, y + dy
-                if (nx, ny) not in visited:
-                    if 0 <= nx < self.map.width and 0 <= ny < self.map.height:
-                        if self.map.tiles[ny][nx] == TILE_EMPTY:
-                            visited.add((nx, ny))
-                            queue.append((nx, ny))
-
-        return False
+    def monster_types(self):
+        """已加载的怪物类型（按名称排序）；一个都没有时抛出 RuntimeError"""
+        types = sorted(self.monster_loader.sprite_frames)
+        if not types:
+            raise RuntimeError(f"No monster types loaded from {self.monster_loader.monster_dir} "
+                               "(run from the repository root)")
+        return types
+
+    def spawn_monster(self, monster_type, room, x=None, y=None):
+        """
+        在房间中生成一个怪物并返回（基准、压力测试等外部工具使用）
+        默认位于房间中心，给出 x/y（像素）时放在该位置；未知的怪物类型抛出 ValueError
+        """
+        if monster_type not in self.monster_types():
+            raise ValueError(f"Unknown monster type: {monster_type!r}")
+        return self._spawn_monster(monster_type, room, x, y)
+
+    def _spawn_monster(self, monster_type, room, x=None, y=None):
+        """在房间中心（或给定的像素坐标）生成一个怪物"""
+        monster = Monster(
+            monster_type=monster_type,
+            monster_loader=self.monster_loader,
+            room=room,
+            map_instance=self.map,
+            store=self.monster_store
+        )
+        store, i = self.monster_store, monster.index
+        if x is not None:
+            store.x[i] = store.prev_x[i] = x
+        if y is not None:
+            store.y[i] = store.prev_y[i] = y
+        self.monsters.append(monster)
+        self.monster_views.append(monster)
+        self.monster_hash.insert(monster, monster.x, monster.y)
+        self.activity.add(monster)
+        # 只为视野内的出生点播放标记，远处房间的怪物不占用特效列表
+        if self._in_view(monster.x, monster.y, self.spawn_marker.half_size):
+            self._add_effect(self.spawn_marker, monster.x, monster.y)
+        print(f"生成怪物：{monster_type}（房间中心：{(int(monster.x), int(monster.y))}）")
+        return monster
+
+    def _add_effect(self, effect, x, y):
+        """在世界坐标 (x, y) 播放一次性特效"""
+        self.active_effects.append((effect, x, y, self.sim_time))
+
+    def _in_view(self, x, y, margin=0):
+        """世界坐标 (x, y) 是否在相机视野内（视野各边外扩 margin 像素）"""
+        return (self.camera_x - margin <= x < self.camera_x + self.screen.get_width() + margin
+                and self.camera_y - margin <= y < self.camera_y + self.screen.get_height() + margin)
+
+    def distance_to_goal(self):
+        """玩家到终点的步行距离（像素），终点不可达时退回曼哈顿距离"""
+        steps = self.navigation.goal_distance(self.player.x, self.player.y)
+        if steps >= 0:
+            return steps * TILE_SIZE
+        return int(self._manhattan_dist((self.player.x, self.player.y), self.end_room))
 
     # ---------------- 内部逻辑 ----------------
 
     def _manhattan_dist(self, pos1, pos2):
         return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
-    def _find_closest_room_center(self, x, y):
-        if not self.room_centers:
-            return (x, y)
-        return min(self.room_centers, key=lambda c: self._manhattan_dist((x, y), c))
-
-    def _handle_player_movement(self):
+    def _poll_input(self):
+        """本步的输入字节：回放时取录像，否则读取按住的移动键和待处理的动作键"""
+        if self.replay is not None:
+            return self.replay.next_input()
+        if self.input_source is not None:
+            keys = self.input_source.get_pressed()
+        else:
+            keys = pygame.key.get_pressed()
+        inputs = self._pending_inputs
+        self._pending_inputs = 0
+        for key, bit in HELD_KEY_INPUTS.items():
+            if keys[key]:
+                inputs |= bit
+        return inputs
+
+    def _apply_actions(self, inputs):
+        """处理本步按下的动作键"""
+        # J 攻击
+        if inputs & INPUT_ATTACK and not self.victory:
+            self.player.start_attack()
+        # K 闪避
+        if inputs & INPUT_EVADE and not self.victory:
+            self.player.start_evade()
+        # 死亡或胜利界面 R 重开（换上预生成的关卡）
+        if inputs & INPUT_RESTART and (self.victory or self.state == "gameover"):
+            self.restart()
+
+    def _handle_player_movement(self, inputs):
         if self.victory:
             self.player.set_animation_state(is_moving=False)
             return
@@ -203,16 +276,15 @@ class GameEngine:
         self.last_player_x = self.player.x
         self.last_player_y = self.player.y
 
-        keys = pygame.key.get_pressed()
         dx, dy = 0, 0
 
-        if keys[pygame.K_w]:
+        if inputs & INPUT_UP:
             dy -= self.move_speed
-        if keys[pygame.K_s]:
+        if inputs & INPUT_DOWN:
             dy += self.move_speed
-        if keys[pygame.K_a]:
+        if inputs & INPUT_LEFT:
             dx -= self.move_speed
-        if keys[pygame.K_d]:
+        if inputs & INPUT_RIGHT:
             dx += self.move_speed
 
         # 斜向速度修正
@@ -248,6 +320,20 @@ class GameEngine:
                 return False
         return True
 
+    def _update_player_room(self):
+        """查询玩家所在房间，跨越房间边界时派发事件"""
+        room = self.map.room_at(self.player.x, self.player.y)
+        if room != self.player_room:
+            previous, self.player_room = self.player_room, room
+            self._on_player_room_changed(previous, room)
+
+    def _on_player_room_changed(self, old_room, new_room):
+        """玩家跨越房间边界（-1 表示走廊）"""
+        if new_room >= 0:
+            print(f"🚪 进入房间 {new_room}")
+            # 唤醒该房间的怪物
+            self.activity.wake_room(new_room)
+
     def _check_victory(self):
         if self._manhattan_dist((self.player.x, self.player.y), self.end_room) <= 30:
             self.victory = True
@@ -256,37 +342,44 @@ class GameEngine:
 
     # ---------------- 更新与绘制 ----------------
 
-    def update(self):
-        delta_time = self.clock.tick(self.FPS)
+    def update(self, dt=SIM_STEP_MS):
+        """推进一个固定模拟步（dt 毫秒），由主循环按固定步长调用"""
+        inputs = self._poll_input()
+        if self.recorder is not None:
+            self.recorder.record(inputs)
+        self._apply_actions(inputs)
+
+        # 记录本步之前的位置，渲染时在两步之间插值
+        self.prev_camera = (self.camera_x, self.camera_y)
+        self.monster_store.snapshot()
+        self.sim_time += dt
 
         if self.state == "game" and not self.victory:
-            self._handle_player_movement()
+            profiler = self.profiler
+            mark = profiler.mark()
+            self._handle_player_movement(inputs)
+            self.navigation.update_player(self.player.x, self.player.y)
+            self._update_player_room()
             self._check_victory()
+            mark = profiler.lap("movement", mark)
             self._check_monster_collision()  # 移动碰撞检测到攻击逻辑前
 
             # 处理玩家攻击
             self._handle_player_attack()
-            # 更新怪物和他们的 projectile
-            for monster in self.monsters[:]:
-                monster.check_player_in_room(self.player.x, self.player.y)
-                monster.update_behavior(self.player.x, self.player.y)
-                monster.update_projectiles()  # 更新小点
-                monster.update_animation()
-
-                # 检测小点是否命中玩家
-                if monster.is_ranged:
-                    for projectile in monster.projectiles[:]:
-                        if projectile.check_collision(self.player):
-                            self._handle_projectile_hit()
-                            monster.projectiles.remove(projectile)
-                            break
-
-                # 移除死亡怪物
-                if monster.current_health <= 0:
-                    self.monsters.remove(monster)
+            mark = profiler.lap("collision", mark)
+            # 更新怪物（只处理被调度到的怪物）
+            awake, reduced, reduced_ticks = self.activity.schedule(self.player.x, self.player.y)
+            self._update_monsters(awake, reduced, reduced_ticks)
+            mark = profiler.lap("monster_ai", mark)
+            self.projectiles.update()  # 更新小点
+            mark = profiler.lap("projectiles", mark)
+
+            # 检测小点是否命中玩家
+            self._check_projectile_hits()
+            profiler.lap("collision", mark)
 
         # 让动画永远更新（防止 idle 停住）
-        self.player.update_animation(delta_time)
+        self.player.update_animation(dt)
 
         # 相机平滑跟随
         target_x = self.player.x - self.screen.get_width() // 2
@@ -295,72 +388,96 @@ class GameEngine:
         self.camera_x += int((target_x - self.camera_x) * 0.1)
         self.camera_y += int((target_y - self.camera_y) * 0.1)
 
-    def draw(self):
+        # 移除播放完毕的特效
+        if self.active_effects:
+            now = self.sim_time
+            self.active_effects = [e for e in self.active_effects if not e[0].finished(now - e[3])]
+
+    def draw(self, alpha=1.0):
+        """
+        绘制画面（不翻转显示）；alpha 为距上一模拟步的进度 [0, 1]，
+        相机、怪物和小点在上一步与当前步之间插值
+        返回本帧绘制了实体和 HUD 的区域（脏矩形），背景由 draw_view（地图与相机）决定
+        """
+        prev_x, prev_y = self.prev_camera
+        camera_x = int(round(prev_x + (self.camera_x - prev_x) * alpha))
+        camera_y = int(round(prev_y + (self.camera_y - prev_y) * alpha))
+        self.draw_view = (self.map, camera_x, camera_y)
+        dirty = []
+
+        profiler = self.profiler
+        mark = profiler.mark()
         self.screen.fill(BLACK)
-        self.map.render(self.screen, self.camera_x, self.camera_y)
+        self.map.render(self.screen, camera_x, camera_y)
+        mark = profiler.lap("map_render", mark)
 
         # ---------------- 新增：绘制怪物（在地图之后、玩家之前） ----------------
-        for monster in self.monsters:
-            monster.draw(self.screen, self.camera_x, self.camera_y)
+        rect = self.projectiles.draw(self.screen, camera_x, camera_y, alpha)
+        if rect is not None:
+            dirty.append(rect)
+        # 只绘制相机视野内的怪物（按结构数组批量裁剪）
+        margin = MONSTER_DRAW_MARGIN
+        visible = self.monster_store.visible(camera_x - margin, camera_y - margin,
+                                             camera_x + self.screen.get_width() + margin,
+                                             camera_y + self.screen.get_height() + margin, alpha)
+        views = self.monster_views
+        for i in visible.tolist():
+            dirty.append(views[i].draw(self.screen, camera_x, camera_y, alpha))
 
         # 玩家绘制（永远在画面中心）
         px = self.screen.get_width() // 2
         py = self.screen.get_height() // 2
-        self.player.draw(self.screen, px, py)
-
-        # 终点标记
-        end_x = self.end_room[0] - self.camera_x
-        end_y = self.end_room[1] - self.camera_y
-
-        pulse = abs(math.sin(pygame.time.get_ticks() * 0.003)) * 0.5 + 0.5
-        outer_radius = int(20 + pulse * 8)
+        rect = self.player.draw(self.screen, px, py)
+        if rect is not None:
+            dirty.append(rect)
 
-        pygame.draw.circle(self.screen, GOLD, (int(end_x), int(end_y)), outer_radius, 2)
+        # 一次性特效（受击闪光、出生标记）
+        for effect, x, y, start in self.active_effects:
+            rect = effect.draw(self.screen, x - camera_x, y - camera_y, self.sim_time - start)
+            if rect is not None:
+                dirty.append(rect)
 
-        angle = pygame.time.get_ticks() * 0.002
-        for i in range(8):
-            a = angle + i * math.pi / 4
-            x1 = end_x + math.cos(a) * 15
-            y1 = end_y + math.sin(a) * 15
-            x2 = end_x + math.cos(a) * 8
-            y2 = end_y + math.sin(a) * 8
-            pygame.draw.line(self.screen, YELLOW, (int(x1), int(y1)), (int(x2), int(y2)), 2)
-
-        pygame.draw.circle(self.screen, GOLD, (int(end_x), int(end_y)), 6)
-        pygame.draw.circle(self.screen, ORANGE, (int(end_x), int(end_y)), 3)
+        # 终点标记（预渲染的循环动画，按真实时间取帧）
+        dirty.append(self.goal_marker.draw(self.screen, self.end_room[0] - camera_x,
+                                           self.end_room[1] - camera_y, pygame.time.get_ticks()))
+        mark = profiler.lap("entities", mark)
 
         # HUD 信息
         hint_text = (
             f"坐标: ({int(self.player.x)}, {int(self.player.y)}) | "
-            f"距终点: {int(self._manhattan_dist((self.player.x, self.player.y), self.end_room))} | "
+            f"距终点: {self.distance_to_goal()} | "
             f"按J攻击，按K闪避"
         )
-        text_surface = self.font.render(hint_text, True, WHITE)
-        self.screen.blit(text_surface, (10, 10))
+        dirty.append(self.text.draw(self.screen, hint_text, (10, 10), WHITE))
 
         # 胜利界面
         if self.victory:
             victory_text = "🎉 到达最远房间！按R重新开始 🎉"
-            surface = self.font.render(victory_text, True, GREEN)
+            surface = self.text.render(victory_text, GREEN)
             rect = surface.get_rect(center=(self.screen.get_width() // 2,
                                            self.screen.get_height() // 2))
             bg_rect = rect.inflate(20, 10)
             pygame.draw.rect(self.screen, BLACK, bg_rect)
             pygame.draw.rect(self.screen, GOLD, bg_rect, 2)
             self.screen.blit(surface, rect)
+            dirty.append(bg_rect)
 
         # 新增：死亡界面
         if self.state == "gameover":
             gameover_text = "💀  游戏结束！按R重新开始 💀"
-            surface = self.font.render(gameover_text, True, RED)
+            surface = self.text.render(gameover_text, RED)
             rect = surface.get_rect(center=(self.screen.get_width() // 2,
                                             self.screen.get_height() // 2))
             bg_rect = rect.inflate(20, 10)
             pygame.draw.rect(self.screen, BLACK, bg_rect)
             pygame.draw.rect(self.screen, RED, bg_rect, 2)
             self.screen.blit(surface, rect)
+            dirty.append(bg_rect)
 
-        pygame.display.flip()
+        profiler.lap("hud", mark)
+        profiler.count("text_cache_hits", self.text.hits)
+        profiler.count("text_cache_misses", self.text.misses)
+        return dirty
 
     def handle_events(self, events):
         for event in events:
@@ -369,37 +486,9 @@ class GameEngine:
                 sys.exit()
 
             if event.type == pygame.KEYDOWN:
-                # J 攻击
-                if event.key == pygame.K_j:
-                    if not self.victory:
-                        self.player.start_attack()
-                    continue
-
-                # K 闪避
-                if event.key == pygame.K_k:
-                    if not self.victory:
-                        self.player.start_evade()
-                    continue
-
-                # 胜利界面 R 重开
-                if event.key == pygame.K_r and self.victory:
-                    try:
-                        self.__init__(self.screen, self.font)
-                        if len(self.map.get_room_centers()) < 2:
-                            self.__init__(self.screen, self.font)
-                    except Exception as e:
-                        print(f"地图生成失败，重试: {e}")
-                        self.__init__(self.screen, self.font)
-                    continue
-                # 死亡或胜利界面 R 重开
-                if event.key == pygame.K_r and (self.victory or self.state == "gameover"):
-                    try:
-                        self.__init__(self.screen, self.font)
-                        if len(self.map.get_room_centers()) < 2:
-                            self.__init__(self.screen, self.font)
-                    except Exception as e:
-                        print(f"地图生成失败，重试: {e}")
-                        self.__init__(self.screen, self.font)
+                # J 攻击 / K 闪避 / R 重开：在下一个模拟步开始时处理（可录制回放）
+                if event.key in ACTION_KEY_INPUTS:
+                    self._pending_inputs |= ACTION_KEY_INPUTS[event.key]
                     continue
 
                 # ESC 退出
@@ -413,7 +502,7 @@ class GameEngine:
             return
 
         # 立即播放攻击音效（无需命中检测）
-        current_time = pygame.time.get_ticks()
+        current_time = self.sim_time
         # 200毫秒冷却，防止快速按J重复播放
         if hasattr(self, 'last_attack_sound_time'):
             if current_time - self.last_attack_sound_time > 200:
@@ -430,52 +519,93 @@ class GameEngine:
         if not self.player.attack_hit:
             attack_range = 30
             player_radius = self.player.radius
-            for monster in self.monsters:
+            nearby = self.monster_hash.query_radius(self.player.x, self.player.y,
+                                                    player_radius + attack_range)
+            for monster in nearby:
                 if not monster.is_active:
                     continue
-                dist = math.hypot(self.player.x - monster.x, self.player.y - monster.y)
-                if dist < player_radius + attack_range:
-                    # 攻击命中，怪物扣血
-                    monster.current_health -= 1
-                    self.player.attack_hit = True  # 标记为已命中
-                    print(f"🗡️  击中 {monster.type}! 剩余生命值: {monster.current_health}")
-                    break
+                # 攻击命中，怪物扣血（nearby 按距离排序，命中最近的怪物）
+                monster.current_health -= 1
+                self.player.attack_hit = True  # 标记为已命中
+                self._add_effect(self.hit_flash, monster.x, monster.y)
+                print(f"🗡️  击中 {monster.type}! 剩余生命值: {monster.current_health}")
+                break
 
         # 不提前结束攻击状态，让动画完整播放
 
     # 在game_engine.py的_check_monster_collision方法中修改，约420-446行
     def _check_monster_collision(self):
         """检测玩家与怪物的碰撞并处理扣血（添加冷却机制和闪避无敌）"""
-        current_time = pygame.time.get_ticks()
+        current_time = self.sim_time
         # 检查是否在冷却时间内（2000毫秒 = 2秒）或玩家正在闪避
         if current_time - self.last_damage_time < 2000 or self.player.is_evading:
             return  # 闪避时直接返回，不进行扣血检测
 
         player_radius = self.player.radius
-        for monster in self.monsters:
-            if monster.is_active and monster.current_health > 0:  # 只检测激活且存活的怪物
-                dist = math.hypot(self.player.x - monster.x, self.player.y - monster.y)
-                if dist < player_radius + 15:  # 15是怪物碰撞半径
-                    # 玩家扣血
-                    if self.player.current_health > 0:
-                        self.player.current_health -= 1
-                        self.last_damage_time = current_time  # 更新最后扣血时间
-                        print(f"❤️  玩家受伤! 剩余生命值: {self.player.current_health}")
-
-                    # 碰撞回弹
-                    self.player.x = self.last_player_x
-                    self.player.y = self.last_player_y
-
-                    # 玩家死亡处理
-                    if self.player.current_health <= 0:
-                        print("💀  玩家死亡!")
-                        self.state = "gameover"
-                    break
+        # 15是怪物碰撞半径
+        nearby = self.monster_hash.query_radius(self.player.x, self.player.y, player_radius + 15)
+        for monster in nearby:
+            if not (monster.is_active and monster.current_health > 0):  # 只检测激活且存活的怪物
+                continue
+            # 玩家扣血
+            if self.player.current_health > 0:
+                self.player.current_health -= 1
+                self.last_damage_time = current_time  # 更新最后扣血时间
+                self._add_effect(self.player_hit_flash, self.player.x, self.player.y)
+                print(f"❤️  玩家受伤! 剩余生命值: {self.player.current_health}")
+
+            # 碰撞回弹
+            self.player.x = self.last_player_x
+            self.player.y = self.last_player_y
+
+            # 玩家死亡处理
+            if self.player.current_health <= 0:
+                print("💀  玩家死亡!")
+                self.state = "gameover"
+            break
+
+    def _update_monsters(self, awake, reduced, reduced_ticks):
+        """批量更新被调度到的怪物：激活、移动、发射、动画"""
+        store = self.monster_store
+        now = self.sim_time
+        if awake:
+            indices = np.array([monster.index for monster in awake], dtype=np.intp)
+            store.update_activation(indices, self.player_room)
+            shooters = store.steer(indices, self.player.x, self.player.y, self.navigation, now)
+            self.projectiles.fire(store.x[shooters], store.y[shooters],
+                                  self.player.x, self.player.y,
+                                  shooters, store.bounds[shooters])
+            store.advance_animation(indices, now)
+            pending = self.projectiles.counts(indices)
+
+            for monster, projectiles in zip(awake, pending):
+                self.monster_hash.update(monster, monster.x, monster.y)
+                # 移除死亡怪物
+                if monster.current_health <= 0:
+                    store.kill(monster.index)
+                    self.projectiles.remove_owner(monster.index)
+                    self.monsters.remove(monster)
+                    self.monster_hash.remove(monster)
+                    self.activity.remove(monster)
+                # 玩家离开且小点全部消失后转入休眠
+                elif not monster.is_active and projectiles == 0:
+                    self.activity.sleep(monster)
+
+        # 附近但未唤醒的怪物降频播放待机动画
+        if reduced:
+            indices = np.array([monster.index for monster in reduced], dtype=np.intp)
+            store.advance_animation(indices, now, reduced_ticks)
+
+    def _check_projectile_hits(self):
+        """检查小点是否命中玩家，命中的小点直接移除"""
+        hits = self.projectiles.hit_test(self.player.x, self.player.y, self.player.radius)
+        if hits:
+            self._handle_projectile_hit()
 
     # 添加处理 projectile 命中的方法
     def _handle_projectile_hit(self):
         """处理小点命中玩家"""
-        current_time = pygame.time.get_ticks()
+        current_time = self.sim_time
         # 检查冷却和闪避状态
         if current_time - self.last_damage_time < 2000 or self.player.is_evading:
             return
@@ -484,6 +614,7 @@ class GameEngine:
         if self.player.current_health > 0:
             self.player.current_health -= 1
             self.last_damage_time = current_time
+            self._add_effect(self.player_hit_flash, self.player.x, self.player.y)
             print(f"❤️  玩家被远程攻击击中! 剩余生命值: {self.player.current_health}")
 
         # 玩家死亡处理
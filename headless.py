@@ -0,0 +1,281 @@
+"""
+无界面模拟：使用 SDL dummy 视频驱动，按键由程序提供，
+不限速地推进 GameEngine 并统计每秒模拟步数
+可用于 CI 性能测试、AI 训练和自动化关卡验证
+
+用法示例：
+    python headless.py --ticks 3600 --seed 1 --policy goal
+    python headless.py --runs 20 --policy goal --render -o results.json
+    python headless.py --policy goal --render --profile
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+import weakref
+
+# 无界面运行（需在 pygame 初始化显示之前设置）
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import numpy as np
+import pygame
+
+from game_engine import GameEngine, SIM_STEP_MS
+from level_pool import SeededLevels
+from map import TILE_EMPTY, TILE_SIZE, TILE_WALL, bfs_distance_field
+from monster_loader import MonsterLoader
+from profiler import FrameProfiler
+from sprite_loader import SpriteLoader
+
+SCREEN_SIZE = (1024, 768)
+
+
+class ScriptedInput:
+    """程序化输入：held 为按住的键，tap 的按键作为 KEYDOWN 事件在下一步派发"""
+
+    def __init__(self):
+        self.held = set()
+        self._events = []
+
+    def get_pressed(self):
+        return _PressedKeys(self.held)
+
+    def hold(self, *keys):
+        """只按住给定的键（替换之前的按键）"""
+        self.held = set(keys)
+
+    def tap(self, key):
+        self._events.append(pygame.event.Event(pygame.KEYDOWN, key=key))
+
+    def drain_events(self):
+        events, self._events = self._events, []
+        return events
+
+
+class _PressedKeys:
+    """与 pygame.key.get_pressed() 返回值相同的下标访问方式"""
+
+    def __init__(self, held):
+        self._held = held
+
+    def __getitem__(self, key):
+        return key in self._held
+
+
+# ---------------- 输入策略：每步调用 policy(engine, controls) ----------------
+
+def idle_policy(engine, controls):
+    """不做任何操作"""
+    controls.hold()
+
+
+def random_policy(engine, controls):
+    """随机游走，偶尔攻击"""
+    if random.random() < 0.05:
+        controls.hold(*random.choice([(), (pygame.K_w,), (pygame.K_s,), (pygame.K_a,), (pygame.K_d,),
+                                      (pygame.K_w, pygame.K_a), (pygame.K_s, pygame.K_d)]))
+    if random.random() < 0.02:
+        controls.tap(pygame.K_j)
+
+
+# 地图 -> 玩家能通过的格子上的终点距离场
+_GOAL_FIELDS = weakref.WeakKeyDictionary()
+
+
+def _clearance_goal_field(engine):
+    """
+    终点距离场（只走四邻都是地板的格子）：玩家半径大于半格，
+    站在格子中心时会占到相邻格，普通距离场会把它引向过不去的窄缝
+    """
+    game_map = engine.map
+    field = _GOAL_FIELDS.get(game_map)
+    if field is None:
+        floor = game_map.tiles == TILE_EMPTY
+        clear = floor.copy()
+        clear[1:, :] &= floor[:-1, :]
+        clear[:-1, :] &= floor[1:, :]
+        clear[:, 1:] &= floor[:, :-1]
+        clear[:, :-1] &= floor[:, 1:]
+        tiles = np.where(clear, TILE_EMPTY, TILE_WALL).astype(np.uint8)
+        goal = (int(engine.end_room[0] // TILE_SIZE), int(engine.end_room[1] // TILE_SIZE))
+        field = bfs_distance_field(tiles, [goal])
+        _GOAL_FIELDS[game_map] = field
+    return field
+
+
+def goal_policy(engine, controls):
+    """沿终点距离场下降方向移动，遇到激活的怪物时攻击"""
+    field = _clearance_goal_field(engine)
+    player = engine.player
+    tx = int(player.x // TILE_SIZE)
+    ty = int(player.y // TILE_SIZE)
+    if not (0 <= tx < engine.map.width and 0 <= ty < engine.map.height):
+        controls.hold()
+        return
+
+    best = (tx, ty)
+    best_value = field[ty, tx]
+    for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        nx, ny = tx + dx, ty + dy
+        if 0 <= nx < engine.map.width and 0 <= ny < engine.map.height:
+            value = field[ny, nx]
+            if 0 <= value < best_value:
+                best, best_value = (nx, ny), value
+
+    # 朝目标格中心移动（在走廊中保持居中，避免卡在墙角）
+    target_x = best[0] * TILE_SIZE + TILE_SIZE / 2
+    target_y = best[1] * TILE_SIZE + TILE_SIZE / 2
+    keys = []
+    if target_x < player.x - 2:
+        keys.append(pygame.K_a)
+    elif target_x > player.x + 2:
+        keys.append(pygame.K_d)
+    if target_y < player.y - 2:
+        keys.append(pygame.K_w)
+    elif target_y > player.y + 2:
+        keys.append(pygame.K_s)
+    controls.hold(*keys)
+
+    if any(m.is_active for m in engine.monster_hash.query_radius(player.x, player.y, player.radius + 30)):
+        controls.tap(pygame.K_j)
+
+
+POLICIES = {"idle": idle_policy, "random": random_policy, "goal": goal_policy}
+
+
+# ---------------- 运行 ----------------
+
+def init_headless(size=SCREEN_SIZE):
+    """初始化 pygame（dummy 驱动），返回绘制用的屏幕；已初始化时直接复用"""
+    screen = pygame.display.get_surface()
+    if screen is None:
+        pygame.init()
+        screen = pygame.display.set_mode(size)
+    return screen
+
+
+def load_resources():
+    """加载精灵和怪物资源（多局运行时只加载一次）"""
+    init_headless()
+    sprite_loader = SpriteLoader()
+    sprite_loader.load_sprites()
+    monster_loader = MonsterLoader()
+    monster_loader.load_monster_gifs()
+    return {"sprite_loader": sprite_loader, "monster_loader": monster_loader}
+
+
+def run_headless(ticks=3600, seed=None, policy=goal_policy, render=False, engine_options=None,
+                 recorder=None, profile=False):
+    """
+    创建 GameEngine 并不限速地推进 ticks 个模拟步（胜利或死亡时提前结束）
+    seed 决定关卡和输入策略的随机数；render 为真时每步也绘制到 dummy 屏幕上
+    recorder 为 replay.InputRecorder 时录制本局输入；profile 为真时统计每步各阶段耗时
+    返回统计字典
+    """
+    screen = init_headless()
+    font = pygame.font.Font(None, 24)
+    options = dict(engine_options or {})
+    if seed is not None:
+        random.seed(seed)
+        options.setdefault("level_pool", SeededLevels(seed))
+    controls = ScriptedInput()
+    # 不统计时用默认容量的关闭状态统计器，记录调用均为空操作
+    profiler = FrameProfiler(enabled=True, history=max(ticks, 1)) if profile else FrameProfiler()
+    options["profiler"] = profiler
+    engine = GameEngine(screen, font, input_source=controls, recorder=recorder, **options)
+
+    steps = 0
+    start = time.perf_counter()
+    while steps < ticks and engine.state == "game":
+        policy(engine, controls)
+        mark = profiler.mark()
+        engine.handle_events(controls.drain_events())
+        profiler.lap("events", mark)
+        engine.update(SIM_STEP_MS)
+        if render:
+            engine.draw()
+        profiler.end_frame()
+        steps += 1
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "seed": seed,
+        "ticks": steps,
+        "elapsed_s": elapsed,
+        "ticks_per_second": steps / elapsed if elapsed > 0 else 0.0,
+        "sim_seconds": steps * SIM_STEP_MS / 1000,
+        "state": engine.state,
+        "player_health": engine.player.current_health,
+        "monsters_left": len(engine.monsters),
+        "goal_distance": engine.distance_to_goal(),
+    }
+    if profile:
+        result["profile_ms"] = profiler.summary()
+        result["counters"] = dict(profiler.counters)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="无界面不限速运行游戏模拟")
+    parser.add_argument("--ticks", type=int, default=3600, help="每局最多模拟步数（60 步 = 1 秒）")
+    parser.add_argument("--runs", type=int, default=1, help="运行局数（种子依次递增）")
+    parser.add_argument("--seed", type=int, default=0, help="起始随机种子")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="goal", help="输入策略")
+    parser.add_argument("--render", action="store_true", help="每步也执行绘制")
+    parser.add_argument("--record", help="把所有局的输入录制到回放文件")
+    parser.add_argument("--profile", action="store_true", help="统计每步各阶段耗时的 p50/p95/p99")
+    parser.add_argument("-o", "--output", default="-", help="输出 JSON 文件（默认标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    # 游戏日志对统计没有意义
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaders = load_resources()
+    recorder = None
+    if args.record:
+        from replay import InputRecorder
+        recorder = InputRecorder()
+    for run in range(args.runs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_headless(args.ticks, args.seed + run, POLICIES[args.policy], args.render, loaders,
+                                  recorder, args.profile)
+        results.append(result)
+        print(f"种子 {result['seed']}: {result['state']}，{result['ticks']} 步，"
+              f"{result['ticks_per_second']:.0f} 步/秒", file=sys.stderr)
+
+    if recorder is not None:
+        recorder.save(args.record)
+        print(f"输入已录制到 {args.record}", file=sys.stderr)
+
+    total_ticks = sum(r["ticks"] for r in results)
+    total_time = sum(r["elapsed_s"] for r in results)
+    summary = {
+        "runs": len(results),
+        "policy": args.policy,
+        "render": args.render,
+        "ticks": total_ticks,
+        "ticks_per_second": total_ticks / total_time if total_time > 0 else 0.0,
+        "victories": sum(1 for r in results if r["state"] == "victory"),
+        "deaths": sum(1 for r in results if r["state"] == "gameover"),
+    }
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        json.dump({"summary": summary, "runs": results}, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
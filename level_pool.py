@@ -0,0 +1,203 @@
+"""
+关卡预生成：在后台线程中提前准备好地图、起点/终点和怪物生成表，
+重新开始或开始新游戏时直接取用，不再阻塞渲染线程
+"""
+import queue
+import threading
+from map import Map, TILE_SIZE, bfs_distance_field
+from rng_streams import RngStreams, new_seed
+
+# 默认地图尺寸（格）
+MAP_WIDTH = 120
+MAP_HEIGHT = 80
+
+
+class Level:
+    """一局游戏所需的预生成数据"""
+
+    def __init__(self, game_map, start_room, end_room, spawn_rooms, seed=None):
+        self.map = game_map
+        self.start_room = start_room    # 起点房间中心（像素）
+        self.end_room = end_room        # 终点房间中心（像素）
+        self.spawn_rooms = spawn_rooms  # 需要生成怪物的房间
+        self.seed = seed                # 关卡种子（用同一种子可完全复现本关）
+
+
+def generate_level(map_width=MAP_WIDTH, map_height=MAP_HEIGHT, max_attempts=3, seed=None):
+    """
+    生成地图并完成起点/终点选择和怪物生成表，地图生成失败时重试
+    seed 为关卡种子，为空时取新种子；地图只使用种子派生的 "map" 随机数流
+    """
+    if seed is None:
+        seed = new_seed()
+    rng = RngStreams(seed).stream("map")
+    game_map = None
+    for attempt in range(max_attempts):
+        try:
+            game_map = Map(map_width, map_height, rng=rng)
+        except RuntimeError as e:
+            print(f"地图生成失败，重试: {e}")
+            continue
+        if len(game_map.get_room_centers()) >= 2:
+            break
+    if game_map is None:
+        raise RuntimeError("Failed to generate a playable dungeon")
+    level = plan_level(game_map)
+    level.seed = seed
+    return level
+
+
+def plan_level(game_map):
+    """为已生成的地图选择起点/终点，并列出需要生成怪物的房间"""
+    room_centers = game_map.get_room_centers()
+    player_x, player_y = game_map.player_position
+
+    if len(room_centers) >= 2:
+        start_room = _find_closest_room_center(room_centers, player_x, player_y)
+        farthest_room, path_distance = _find_farthest_room_by_path(
+            game_map, room_centers, (player_x, player_y)
+        )
+
+        if farthest_room and farthest_room != start_room:
+            end_room = farthest_room
+            print(f"终点设置完成 - 路径距离: {int(path_distance)}")
+        else:
+            max_distance = -1
+            end_room = start_room
+            for center in room_centers:
+                if center != start_room:
+                    dist = _manhattan_dist(start_room, center)
+                    if dist > max_distance:
+                        max_distance = dist
+                        end_room = center
+            print("使用空间距离回退方案")
+    else:
+        start_room = (player_x, player_y)
+        end_room = (player_x + 300, player_y + 300)
+
+    # 终点随地图一起保存，便于存档和复现
+    game_map.end_position = end_room
+
+    # 每个房间生成一个怪物（跳过起点附近和终点房间）
+    spawn_rooms = []
+    for room in game_map.rooms:
+        room_center_pixel = (
+            (room["x"] + room["width"] // 2) * TILE_SIZE + TILE_SIZE // 2,
+            (room["y"] + room["height"] // 2) * TILE_SIZE + TILE_SIZE // 2
+        )
+        is_start_room = _manhattan_dist(room_center_pixel, start_room) < 100
+        is_end_room = _manhattan_dist(room_center_pixel, end_room) < 100
+        if not (is_start_room or is_end_room):
+            spawn_rooms.append(room)
+
+    return Level(game_map, start_room, end_room, spawn_rooms)
+
+
+# ---------------- 路径计算 ----------------
+
+def _find_farthest_room_by_path(game_map, room_centers, start_pos):
+    """
+    从起点格做一次 BFS 得到完整距离场，直接读出最远房间和真实步行距离（像素）
+    候选房间取 room_graph 中与起点房间连通的房间
+    """
+    if not room_centers or len(room_centers) < 2:
+        return None, 0
+
+    start_tile = (int(start_pos[0] // TILE_SIZE), int(start_pos[1] // TILE_SIZE))
+    distances = bfs_distance_field(game_map.tiles, [start_tile])
+
+    start_index = game_map.room_at(start_pos[0], start_pos[1])
+    if start_index >= 0:
+        candidates = _reachable_rooms(game_map.room_graph, start_index)
+    else:
+        candidates = range(len(game_map.rooms))
+
+    max_distance = 0
+    farthest_room = _find_closest_room_center(room_centers, start_pos[0], start_pos[1])
+    for index in candidates:
+        cx, cy, _ = game_map.room_centers_grid[index]
+        steps = int(distances[cy, cx])
+        if steps * TILE_SIZE > max_distance:
+            max_distance = steps * TILE_SIZE
+            farthest_room = (cx * TILE_SIZE + TILE_SIZE // 2, cy * TILE_SIZE + TILE_SIZE // 2)
+
+    return farthest_room, max_distance
+
+
+def _reachable_rooms(room_graph, start_index):
+    """房间连接图上与起点房间连通的所有房间"""
+    seen = {start_index}
+    stack = [start_index]
+    while stack:
+        for other in room_graph.get(stack.pop(), []):
+            if other not in seen:
+                seen.add(other)
+                stack.append(other)
+    return sorted(seen)
+
+
+def _manhattan_dist(pos1, pos2):
+    return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
+
+
+def _find_closest_room_center(room_centers, x, y):
+    if not room_centers:
+        return (x, y)
+    return min(room_centers, key=lambda c: _manhattan_dist((x, y), c))
+
+
+class LevelPool:
+    """后台关卡池：工作线程始终保持 size 个准备好的关卡"""
+
+    def __init__(self, size=1, map_width=MAP_WIDTH, map_height=MAP_HEIGHT):
+        self.map_width = map_width
+        self.map_height = map_height
+        self._ready = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="LevelPool", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        """持续生成关卡，池满时等待被取走"""
+        while not self._stop.is_set():
+            try:
+                level = generate_level(self.map_width, self.map_height)
+            except Exception as e:
+                print(f"❌ 后台关卡生成失败: {e}")
+                continue
+            while not self._stop.is_set():
+                try:
+                    self._ready.put(level, timeout=0.2)
+                    break
+                except queue.Full:
+                    continue
+
+    def get(self):
+        """取出一个准备好的关卡；池为空时在当前线程同步生成"""
+        try:
+            return self._ready.get_nowait()
+        except queue.Empty:
+            print("⚠️ 预生成关卡未就绪，同步生成")
+            return generate_level(self.map_width, self.map_height)
+
+    def close(self):
+        """停止后台线程"""
+        self._stop.set()
+        self._worker.join(timeout=1.0)
+
+
+class SeededLevels:
+    """按种子序列同步生成关卡（接口与 LevelPool 相同），用于可复现的运行"""
+
+    def __init__(self, seed, map_width=MAP_WIDTH, map_height=MAP_HEIGHT):
+        self.next_seed = seed
+        self.map_width = map_width
+        self.map_height = map_height
+
+    def get(self):
+        level = generate_level(self.map_width, self.map_height, seed=self.next_seed)
+        self.next_seed += 1
+        return level
+
+    def close(self):
+        pass
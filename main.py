@@ -3,9 +3,17 @@ Python 地牢游戏 - 主程序
 支持全屏自适应窗口和开场动画
 """
 import pygame
+import argparse
 import os
 import sys
-from game_engine import GameEngine
+import time
+from game_engine import GameEngine, SIM_STEP_MS
+from level_pool import LevelPool
+from replay import InputRecorder
+from profiler import FrameProfiler
+from dirty_rects import DirtyRegions
+from text_cache import TextCache
+from effects import EffectCache
 
 # 初始化 Pygame
 try:
@@ -25,6 +33,11 @@ DARK_GRAY = (30, 30, 30)
 GOLD = (255, 215, 0)
 RED = (200, 0, 0)
 
+# 主循环：模拟按固定步长推进，渲染频率独立
+MAX_FRAME_MS = 250       # 单帧最多计入的时间（卡顿或拖动窗口后不追赶过久）
+MAX_SIM_STEPS = 5        # 单帧最多模拟的步数，防止越追越慢的死亡螺旋
+DEFAULT_MAX_FPS = 60     # 默认渲染帧率上限（0 为不限制，需显式指定）
+
 # 获取资源路径的辅助函数
 def resource_path(relative_path):
     """获取资源的绝对路径"""
@@ -36,10 +49,19 @@ def resource_path(relative_path):
 
 class Game:
     """游戏主类"""
-    def __init__(self):
+    def __init__(self, max_fps=DEFAULT_MAX_FPS, vsync=False, record_path=None, dirty_rects=False):
+        # 渲染帧率上限（0 表示不限制）与垂直同步
+        self.max_fps = max_fps
+        self.vsync = vsync
+        # 脏矩形提交：游戏中相机不动时只提交实体和 HUD 所在的区域
+        self.dirty_rects = dirty_rects
+        self.dirty_regions = DirtyRegions()
+        # 输入录制：退出时把本次运行的所有关卡和输入写入回放文件
+        self.record_path = record_path
+        self.recorder = InputRecorder() if record_path else None
         try:
             # 创建窗口模式（节省资源）
-            self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+            self.screen = self._set_display_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
             pygame.display.set_caption("地牢冒险")
         except pygame.error as e:
             print(f"创建游戏窗口失败: {e}")
@@ -52,12 +74,26 @@ class Game:
 
         # 加载资源
         self.load_resources()
+        # 文字缓存：菜单、暂停、帧率等文字只光栅化一次
+        self.title_text = TextCache(self.title_font)
+        self.subtitle_text = TextCache(self.subtitle_font)
+        # 开场动画淡入的文字：每段文字一张独立表面，淡入只改整体透明度
+        self.intro_surfaces = {}
+        # 预渲染的特效帧，各局游戏共用；启动时渲染好，开始游戏时不再卡顿
+        self.effects = EffectCache()
+        self.effects.preload("goal_marker", "hit_flash", "spawn_marker")
 
         # 游戏状态：intro（开场动画）, menu（主菜单）, game（游戏进行中）
         self.state = "intro"
 
         # 游戏引擎实例（在进入游戏状态时初始化）
         self.game_engine = None
+        # 已加载的精灵/怪物资源，新游戏时复用
+        self.sprite_loader = None
+        self.monster_loader = None
+
+        # 后台预生成关卡，开始新游戏或重开时直接取用
+        self.level_pool = LevelPool()
 
         # 开场动画相关
         self.intro_alpha = 0
@@ -79,6 +115,9 @@ class Game:
         self.fps_counter = 0
         self.fps_timer = 0
         self.current_fps = 0
+        # 分阶段帧耗时统计（F1 第二次按下时开启），等宽字体显示百分位表
+        self.profiler = FrameProfiler()
+        self.profiler_font = pygame.font.SysFont("dejavusansmono,consolas,couriernew,monospace", 14)
 
         # 新增功能：暂停状态
         self.paused = False
@@ -307,9 +346,15 @@ class Game:
                         print("键盘按键：3/Q - 退出游戏")
                         self.running = False
                         return
-                # 新增：F1显示/隐藏帧率
+                # F1 循环切换：关闭 → 帧率 → 帧率 + 分阶段耗时
                 elif event.key == pygame.K_F1:
-                    self.show_fps = not self.show_fps
+                    if not self.show_fps:
+                        self.show_fps = True
+                    elif not self.profiler.enabled:
+                        self.profiler.set_enabled(True)
+                    else:
+                        self.show_fps = False
+                        self.profiler.set_enabled(False)
                 # 新增：F11切换全屏
                 elif event.key == pygame.K_F11:
                     self.toggle_fullscreen()
@@ -344,7 +389,16 @@ class Game:
     def _start_new_game(self):
         """开始新游戏"""
         print("新游戏启动")
-        self.game_engine = GameEngine(self.screen, self.subtitle_font)
+        self.game_engine = GameEngine(self.screen, self.subtitle_font,
+                                      level_pool=self.level_pool,
+                                      sprite_loader=self.sprite_loader,
+                                      monster_loader=self.monster_loader,
+                                      recorder=self.recorder,
+                                      profiler=self.profiler,
+                                      text_cache=self.subtitle_text,
+                                      effect_cache=self.effects)
+        self.sprite_loader = self.game_engine.sprite_loader
+        self.monster_loader = self.game_engine.monster_loader
         # 传递攻击音效到游戏引擎
         self.game_engine.attack_sound = self.attack_sound
         self.state = "game"
@@ -354,24 +408,34 @@ class Game:
             pygame.mixer.music.play(-1)
             self.background_music_playing = True
 
+    def _set_display_mode(self, size, flags=0):
+        """创建显示窗口；开启垂直同步时需要 SCALED 标志"""
+        if self.vsync:
+            try:
+                return pygame.display.set_mode(size, flags | pygame.SCALED, vsync=1)
+            except pygame.error as e:
+                print(f"⚠️ 垂直同步不可用，改用普通模式: {e}")
+        return pygame.display.set_mode(size, flags)
+
     def toggle_fullscreen(self):
         """切换全屏/窗口模式"""
         self.fullscreen = not self.fullscreen
+        self.dirty_regions.reset()
         if self.fullscreen:
             # 保存当前窗口尺寸以便恢复
             self.windowed_size = self.screen.get_size()
             # 设置为全屏模式
-            self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            self.screen = self._set_display_mode((0, 0), pygame.FULLSCREEN)
         else:
             # 恢复窗口模式
-            self.screen = pygame.display.set_mode(self.windowed_size)
+            self.screen = self._set_display_mode(self.windowed_size)
         # 重新调整背景（如果有）
         if self.background:
             self.background = pygame.transform.scale(self.background, self.screen.get_size())
         print(f"切换至{'全屏' if self.fullscreen else '窗口'}模式")
 
     def update(self):
-        """确保游戏状态下持续更新"""
+        """推进一个固定模拟步（SIM_STEP_MS 毫秒）"""
         if self.state == "intro":
             if not self.fade_from_black_complete:
                 self.fade_from_black_alpha -= self.fade_from_black_speed
@@ -388,14 +452,14 @@ class Game:
                 if self.title_y_offset >= 0:
                     self.title_y_offset = 0
             else:
-                self.intro_timer += self.clock.get_time()
+                self.intro_timer += SIM_STEP_MS
                 if self.intro_timer >= self.intro_duration:
                     self.intro_alpha -= 3
                     if self.intro_alpha <= 0:
                         self.state = "menu"
         elif self.state == "game" and not self.paused:  # 暂停时不更新游戏状态
             if self.game_engine:
-                self.game_engine.update()  # 强制每帧更新游戏引擎
+                self.game_engine.update(SIM_STEP_MS)
 
     def draw_intro(self):
         """绘制开场动画"""
@@ -411,22 +475,33 @@ class Game:
             return
         title_text = "地牢冒险"
         alpha_factor = max(0.0, min(1.0, self.intro_alpha / 255.0))
-        fade_gold = tuple(int(c * alpha_factor) for c in GOLD)
         if self.title_font:
-            title_surface = self.title_font.render(title_text, True, fade_gold)
+            title_surface = self._intro_surface(self.title_text, title_text, GOLD, alpha_factor)
             title_rect = title_surface.get_rect(center=(self.screen.get_width() // 2,
                                                          self.screen.get_height() // 2 - 80 + self.title_y_offset))
             self.screen.blit(title_surface, title_rect)
         subtitle_text = "按空格键或点击鼠标开始游戏"
         subtitle_alpha = max(0, self.intro_alpha - 50)
         subtitle_alpha_factor = max(0.0, min(1.0, subtitle_alpha / 255.0))
-        fade_white = tuple(int(c * subtitle_alpha_factor) for c in WHITE)
         if self.subtitle_font:
-            subtitle_surface = self.subtitle_font.render(subtitle_text, True, fade_white)
+            subtitle_surface = self._intro_surface(self.subtitle_text, subtitle_text, WHITE,
+                                                   subtitle_alpha_factor)
             subtitle_rect = subtitle_surface.get_rect(center=(self.screen.get_width() // 2,
                                                               self.screen.get_height() // 2 + 60))
             self.screen.blit(subtitle_surface, subtitle_rect)
 
+    def _intro_surface(self, cache, text, color, alpha_factor):
+        """
+        淡入中的文字：从缓存取一次并复制（不改动菜单共用的缓存表面），
+        之后每帧只调整透明度，不再按渐变颜色逐帧光栅化
+        """
+        surface = self.intro_surfaces.get(text)
+        if surface is None:
+            surface = cache.render(text, color).copy()
+            self.intro_surfaces[text] = surface
+        surface.set_alpha(int(255 * alpha_factor))
+        return surface
+
     def draw_menu(self):
         """绘制游戏菜单"""
         if self.background:
@@ -435,7 +510,7 @@ class Game:
             self.screen.fill(DARK_GRAY)
         if self.title_font:
             title_text = "地牢冒险"
-            title_surface = self.title_font.render(title_text, True, GOLD)
+            title_surface = self.title_text.render(title_text, GOLD)
             title_rect = title_surface.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() // 4))
             self.screen.blit(title_surface, title_rect)
         if self.subtitle_font:
@@ -444,64 +519,101 @@ class Game:
                 ("3. 退出游戏", self.screen.get_height()//2 + 50)
             ]
             for text, y in options:
-                surf = self.subtitle_font.render(text, True, WHITE)
+                surf = self.subtitle_text.render(text, WHITE)
                 text_rect = surf.get_rect(center=(self.screen.get_width()//2, y))
                 self.screen.blit(surf, text_rect)
             hint_text = "使用数字键1-3选择，或点击对应选项 | F11: 全屏切换"
-            hint_surface = self.subtitle_font.render(hint_text, True, (200, 200, 200))
+            hint_surface = self.subtitle_text.render(hint_text, (200, 200, 200))
             hint_rect = hint_surface.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() - 60))
             self.screen.blit(hint_surface, hint_rect)
 
-    def draw(self):
-        """绘制游戏画面"""
+    def draw(self, alpha=1.0):
+        """绘制游戏画面；alpha 为两个模拟步之间的插值系数"""
+        # 本帧的脏矩形（None 表示需要整屏提交）
+        dirty = None
         if self.state == "intro":
             self.draw_intro()
         elif self.state == "menu":
             self.draw_menu()
         elif self.state == "game":
             if self.game_engine:
-                self.game_engine.draw()
+                dirty = self.game_engine.draw(1.0 if self.paused else alpha)
                 # 绘制暂停提示
                 if self.paused:
-                    pause_surface = self.title_font.render("暂停中", True, GOLD)
+                    dirty = None
+                    pause_surface = self.title_text.render("暂停中", GOLD)
                     pause_rect = pause_surface.get_rect(center=(self.screen.get_width()//2, self.screen.get_height()//2))
                     # 添加半透明背景
                     overlay = pygame.Surface((self.screen.get_width(), self.screen.get_height()), pygame.SRCALPHA)
                     overlay.fill((0, 0, 0, 128))  # 半透明黑色
                     self.screen.blit(overlay, (0, 0))
                     self.screen.blit(pause_surface, pause_rect)
-                    hint_surface = self.subtitle_font.render("按空格键继续", True, WHITE)
+                    hint_surface = self.subtitle_text.render("按空格键继续", WHITE)
                     hint_rect = hint_surface.get_rect(center=(self.screen.get_width()//2, self.screen.get_height()//2 + 60))
                     self.screen.blit(hint_surface, hint_rect)
 
         # 显示帧率
         if self.show_fps and self.subtitle_font:
             fps_text = f"FPS: {self.current_fps}"
-            fps_surface = self.subtitle_font.render(fps_text, True, (0, 255, 0))
-            self.screen.blit(fps_surface, (10, 10))
-
-        pygame.display.flip()
+            fps_rect = self.subtitle_text.draw(self.screen, fps_text, (10, 10), (0, 255, 0))
+            if dirty is not None:
+                dirty.append(fps_rect)
+        panel_rect = self.profiler.draw(self.screen, self.profiler_font)
+        if dirty is not None and panel_rect is not None:
+            dirty.append(panel_rect)
+
+        mark = self.profiler.mark()
+        if self.dirty_rects and dirty is not None:
+            self.dirty_regions.present(self.screen, dirty, self.game_engine.draw_view)
+        else:
+            self.dirty_regions.reset()
+            pygame.display.flip()
+        self.profiler.lap("flip", mark)
+        if self.dirty_rects:
+            self.profiler.count("partial_presents", self.dirty_regions.partial_frames)
+            self.profiler.count("full_presents", self.dirty_regions.full_frames)
 
     def run(self):
-        """优化主循环，增加新功能"""
+        """
+        主循环：累加真实经过的时间，按固定步长推进模拟，
+        剩余的不足一步的时间作为插值系数交给渲染
+        """
+        accumulator = 0.0
+        previous = time.perf_counter()
         try:
             while self.running:
-                # 获取帧间隔时间
-                delta_time = self.clock.tick(60)
-                # 帧率计算
+                now = time.perf_counter()
+                frame_ms = min((now - previous) * 1000, MAX_FRAME_MS)
+                previous = now
+                accumulator += frame_ms
+
+                # 帧率计算（渲染帧）
                 self.fps_counter += 1
-                self.fps_timer += delta_time
+                self.fps_timer += frame_ms
                 if self.fps_timer >= 1000:  # 每秒更新一次帧率
                     self.current_fps = self.fps_counter
                     self.fps_counter = 0
                     self.fps_timer = 0
 
+                mark = self.profiler.mark()
                 self.handle_events()
-                self.update()
-                self.draw()
-
-                # 限制帧率波动
-                pygame.time.delay(max(0, 16 - delta_time))  # 确保至少16ms一帧
+                self.profiler.lap("events", mark)
+
+                steps = 0
+                while accumulator >= SIM_STEP_MS and steps < MAX_SIM_STEPS:
+                    self.update()
+                    accumulator -= SIM_STEP_MS
+                    steps += 1
+                # 模拟跟不上时丢弃积压的时间，而不是在下一帧模拟更多步
+                if steps == MAX_SIM_STEPS:
+                    accumulator = min(accumulator, SIM_STEP_MS)
+
+                self.draw(accumulator / SIM_STEP_MS)
+                self.profiler.end_frame()
+
+                # 渲染限速：开启垂直同步时由 flip 等待，否则按 max_fps 限制（0 为不限）
+                if self.max_fps and not self.vsync:
+                    self.clock.tick(self.max_fps)
         except KeyboardInterrupt:
             print("\n游戏被用户中断")
         except Exception as e:
@@ -509,16 +621,35 @@ class Game:
             import traceback
             traceback.print_exc()
         finally:
+            # 停止后台关卡生成
+            self.level_pool.close()
+            # 保存录像
+            if self.recorder is not None and self.recorder.segments:
+                self.recorder.save(self.record_path)
+                print(f"🎬 输入已录制到 {self.record_path}")
             # 退出时停止所有音效
             pygame.mixer.music.stop()
             pygame.mixer.quit()
             pygame.quit()
             sys.exit(0)
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="地牢冒险")
+    parser.add_argument("--max-fps", type=int, default=DEFAULT_MAX_FPS,
+                        help=f"渲染帧率上限（默认 {DEFAULT_MAX_FPS}，0 为不限制）")
+    parser.add_argument("--vsync", action="store_true", help="开启垂直同步")
+    parser.add_argument("--record", help="把输入录制到回放文件（用 replay.py 回放）")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="相机不动时只提交变化的区域（脏矩形），相机移动时整屏提交")
+    return parser.parse_args(argv)
+
+
 def main():
     """主函数"""
+    args = parse_args()
     try:
-        game = Game()
+        game = Game(max_fps=args.max_fps, vsync=args.vsync, record_path=args.record,
+                    dirty_rects=args.dirty_rects)
         game.run()
     except Exception as e:
         print(f"游戏初始化失败: {e}")
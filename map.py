@@ -1,6 +1,8 @@
+import math
 import random
 import pygame
-from collections import deque
+import numpy as np
+from collections import OrderedDict, deque
 
 # 地图常量
 TILE_EMPTY = 0
@@ -8,9 +10,16 @@ TILE_WALL = 1
 TILE_STAIRS = 5
 TILE_SIZE = 16
 
+# 地图渲染分块：每块边长（格）；缓存的块数为一屏最多覆盖的块数乘以该倍数
+CHUNK_TILES = 32
+CHUNK_CACHE_SCREENS = 2
+
 # 固定走廊宽度
 CORRIDOR_WIDTH = 3  # 固定走廊宽度为3格
 
+# 房间容器边长（格），每个容器最多放置一个房间
+ROOM_CONTAINER_SIZE = 32
+
 # 三种房间尺寸
 ROOM_SIZES = [
     (9, 12),  # 小房间：走廊宽度的3-4倍
@@ -19,99 +28,104 @@ ROOM_SIZES = [
 ]
 
 
-def generate_dungeon(width, height, rooms_min=6, rooms_max=16):
+def room_grid_shape(width, height):
+    """按地图尺寸计算房间容器网格的列数和行数"""
+    grid_w = max(1, -(-width // ROOM_CONTAINER_SIZE))
+    grid_h = max(1, -(-height // ROOM_CONTAINER_SIZE))
+    return grid_w, grid_h
+
+
+def generate_dungeon(width, height, rooms_min=6, rooms_max=None, density=0.7, loop_edges=0, rng=None):
     """
     生成随机地牢地图，固定走廊宽度，三种房间尺寸
+    房间容器网格随地图尺寸缩放，density 为每个容器生成房间的概率，
+    loop_edges 为生成树之外额外连接的走廊数（形成回路）
+    rng 为随机数生成器（random.Random），为空时使用全局 random
     """
-    num_room_side = 4
-    size_room_container = 32
+    rng = random if rng is None else rng
+    grid_w, grid_h = room_grid_shape(width, height)
+    size_room_container = ROOM_CONTAINER_SIZE
+    num_cells = grid_w * grid_h
 
-    rooms_max = min(rooms_max, 16)
-    rooms_min = max(rooms_min, 4)
+    rooms_max = num_cells if rooms_max is None else min(rooms_max, num_cells)
+    rooms_min = min(max(rooms_min, 4), rooms_max)
 
     # 初始化房间网格
     room_map = [[{
         "is_valid": False,
         "x": 0, "y": 0, "width": 0, "height": 0,
         "grid_x": x, "grid_y": y
-    } for x in range(num_room_side)] for y in range(num_room_side)]
+    } for x in range(grid_w)] for y in range(grid_h)]
+
+    def place_room(gx, gy, rw, rh):
+        """在容器中居中放置房间，超出地图边界时放弃"""
+        room_x = gx * size_room_container + (size_room_container - rw) // 2
+        room_y = gy * size_room_container + (size_room_container - rh) // 2
+        if (room_x >= 0 and room_y >= 0 and
+                room_x + rw < width and room_y + rh < height):
+            room_map[gy][gx].update({
+                "is_valid": True,
+                "x": room_x,
+                "y": room_y,
+                "width": rw,
+                "height": rh
+            })
+            return True
+        return False
 
     # 随机生成房间（三种尺寸）
-    for y in range(num_room_side):
-        for x in range(num_room_side):
-            if random.random() < 0.7:
+    for y in range(grid_h):
+        for x in range(grid_w):
+            if rng.random() < density:
                 # 随机选择一种房间尺寸
-                size_type = random.choice(ROOM_SIZES)
-                room_width = random.randint(size_type[0], size_type[1])
-                room_height = random.randint(size_type[0], size_type[1])
-
-                room_x = x * size_room_container + (size_room_container - room_width) // 2
-                room_y = y * size_room_container + (size_room_container - room_height) // 2
-
-                if room_x + room_width < width and room_y + room_height < height:
-                    room_map[y][x].update({
-                        "is_valid": True,
-                        "x": room_x,
-                        "y": room_y,
-                        "width": room_width,
-                        "height": room_height
-                    })
+                size_type = rng.choice(ROOM_SIZES)
+                room_width = rng.randint(size_type[0], size_type[1])
+                room_height = rng.randint(size_type[0], size_type[1])
+                place_room(x, y, room_width, room_height)
 
     # 保证至少有 rooms_min 个房间
     valid_rooms = [room for row in room_map for room in row if room["is_valid"]]
     attempts = 0
-    max_attempts = 100  # 最大尝试次数
+    max_attempts = max(100, num_cells * 2)  # 最大尝试次数
 
     while len(valid_rooms) < rooms_min and attempts < max_attempts:
         attempts += 1
-        rx = random.randint(0, num_room_side - 1)
-        ry = random.randint(0, num_room_side - 1)
+        rx = rng.randint(0, grid_w - 1)
+        ry = rng.randint(0, grid_h - 1)
 
         if not room_map[ry][rx]["is_valid"]:
-            size_type = random.choice(ROOM_SIZES)
-            rw = random.randint(size_type[0], size_type[1])
-            rh = random.randint(size_type[0], size_type[1])
-            room_x = rx * size_room_container + (size_room_container - rw) // 2
-            room_y = ry * size_room_container + (size_room_container - rh) // 2
-
+            size_type = rng.choice(ROOM_SIZES)
+            rw = rng.randint(size_type[0], size_type[1])
+            rh = rng.randint(size_type[0], size_type[1])
             # 确保房间在地图边界内
-            if (room_x >= 0 and room_y >= 0 and
-                    room_x + rw < width and room_y + rh < height):
-                room_map[ry][rx].update({
-                    "is_valid": True,
-                    "x": room_x,
-                    "y": room_y,
-                    "width": rw,
-                    "height": rh
-                })
-                valid_rooms = [r for row in room_map for r in row if r["is_valid"]]
+            if place_room(rx, ry, rw, rh):
+                valid_rooms.append(room_map[ry][rx])
+
+    # 按网格顺序排列房间
+    valid_rooms = [r for row in room_map for r in row if r["is_valid"]]
 
     # 如果还是没有足够房间，强制生成（使用小房间）
     if len(valid_rooms) < rooms_min:
-        for ry in range(num_room_side):
-            for rx in range(num_room_side):
+        for ry in range(grid_h):
+            for rx in range(grid_w):
                 if len(valid_rooms) >= rooms_min:
                     break
                 if not room_map[ry][rx]["is_valid"]:
                     # 使用最小房间尺寸确保能放入
                     rw = ROOM_SIZES[0][0]  # 最小房间宽度
                     rh = ROOM_SIZES[0][0]  # 最小房间高度
-                    room_x = rx * size_room_container + (size_room_container - rw) // 2
-                    room_y = ry * size_room_container + (size_room_container - rh) // 2
-
-                    if (room_x >= 0 and room_y >= 0 and
-                            room_x + rw < width and room_y + rh < height):
-                        room_map[ry][rx].update({
-                            "is_valid": True,
-                            "x": room_x,
-                            "y": room_y,
-                            "width": rw,
-                            "height": rh
-                        })
-                        valid_rooms = [r for row in room_map for r in row if r["is_valid"]]
-
-    # 初始化地图为墙
-    dungeon = [[TILE_WALL for _ in range(width)] for _ in range(height)]
+                    if place_room(rx, ry, rw, rh):
+                        valid_rooms.append(room_map[ry][rx])
+        valid_rooms = [r for row in room_map for r in row if r["is_valid"]]
+
+    # 超出上限时随机舍弃多余房间
+    if len(valid_rooms) > rooms_max:
+        for room in rng.sample(valid_rooms, len(valid_rooms) - rooms_max):
+            room["is_valid"] = False
+        valid_rooms = [r for row in room_map for r in row if r["is_valid"]]
+
+    # 初始化地图为墙（连续的 uint8 二维数组，按 [y, x] 索引）
+    dungeon = np.full((height, width), TILE_WALL, dtype=np.uint8)
 
     # 验证是否有足够的房间
     if len(valid_rooms) == 0:
@@ -127,123 +141,88 @@ def generate_dungeon(width, height, rooms_min=6, rooms_max=16):
         }
         valid_rooms = [center_room]
 
+    # 挖空矩形区域（切片赋值，自动裁剪到地图边界）
+    def carve_rect(x1, y1, x2, y2):
+        """将 [x1, x2] x [y1, y2]（含端点）范围设为地板"""
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, width - 1), min(y2, height - 1)
+        if x1 <= x2 and y1 <= y2:
+            dungeon[y1:y2 + 1, x1:x2 + 1] = TILE_EMPTY
+
     # 绘制房间
     for room in valid_rooms:
-        for iy in range(room["y"], room["y"] + room["height"]):
-            for ix in range(room["x"], room["x"] + room["width"]):
-                if 0 <= ix < width and 0 <= iy < height:
-                    dungeon[iy][ix] = TILE_EMPTY
+        carve_rect(room["x"], room["y"],
+                   room["x"] + room["width"] - 1, room["y"] + room["height"] - 1)
 
     # 挖掘走廊函数（固定宽度，平滑转角）
     def carve_path(x1, y1, x2, y2):
         """挖掘固定宽度的L型走廊，处理平滑转角"""
         half_width = CORRIDOR_WIDTH // 2
 
-        if random.choice([True, False]):
-            # 路径1：先水平后垂直
-            # 水平段
-            sx, ex = min(x1, x2), max(x1, x2)
-            for x in range(sx, ex + 1):
-                for dy in range(-half_width, half_width + 1):
-                    yy = y1 + dy
-                    if 0 <= x < width and 0 <= yy < height:
-                        dungeon[yy][x] = TILE_EMPTY
-
-            # 垂直段
-            sy, ey = min(y1, y2), max(y1, y2)
-            for y in range(sy, ey + 1):
-                for dx in range(-half_width, half_width + 1):
-                    xx = x2 + dx
-                    if 0 <= xx < width and 0 <= y < height:
-                        dungeon[y][xx] = TILE_EMPTY
-
-            # 填充转角区域（确保转角平滑连接）
+        if rng.choice([True, False]):
+            # 路径1：先水平后垂直，转角在 (x2, y1)
             corner_x, corner_y = x2, y1
-            for dy in range(-half_width, half_width + 1):
-                for dx in range(-half_width, half_width + 1):
-                    cx = corner_x + dx
-                    cy = corner_y + dy
-                    if 0 <= cx < width and 0 <= cy < height:
-                        dungeon[cy][cx] = TILE_EMPTY
+            carve_rect(min(x1, x2), y1 - half_width, max(x1, x2), y1 + half_width)
+            carve_rect(x2 - half_width, min(y1, y2), x2 + half_width, max(y1, y2))
         else:
-            # 路径2：先垂直后水平
-            # 垂直段
-            sy, ey = min(y1, y2), max(y1, y2)
-            for y in range(sy, ey + 1):
-                for dx in range(-half_width, half_width + 1):
-                    xx = x1 + dx
-                    if 0 <= xx < width and 0 <= y < height:
-                        dungeon[y][xx] = TILE_EMPTY
-
-            # 水平段
-            sx, ex = min(x1, x2), max(x1, x2)
-            for x in range(sx, ex + 1):
-                for dy in range(-half_width, half_width + 1):
-                    yy = y2 + dy
-                    if 0 <= x < width and 0 <= yy < height:
-                        dungeon[yy][x] = TILE_EMPTY
-
-            # 填充转角区域
+            # 路径2：先垂直后水平，转角在 (x1, y2)
             corner_x, corner_y = x1, y2
-            for dy in range(-half_width, half_width + 1):
-                for dx in range(-half_width, half_width + 1):
-                    cx = corner_x + dx
-                    cy = corner_y + dy
-                    if 0 <= cx < width and 0 <= cy < height:
-                        dungeon[cy][cx] = TILE_EMPTY
+            carve_rect(x1 - half_width, min(y1, y2), x1 + half_width, max(y1, y2))
+            carve_rect(min(x1, x2), y2 - half_width, max(x1, x2), y2 + half_width)
+
+        # 填充转角区域（确保转角平滑连接）
+        carve_rect(corner_x - half_width, corner_y - half_width,
+                   corner_x + half_width, corner_y + half_width)
 
     # 获取房间中心点（地砖坐标）
     centers = [(r["x"] + r["width"] // 2, r["y"] + r["height"] // 2) for r in valid_rooms]
     if not centers:
         return dungeon, [], {}, []
 
-    # 使用 MST 连接所有房间
-    random.shuffle(centers)
-    connected = [centers[0]]
-    unconnected = centers[1:]
+    # 用最小生成树（加若干回路边）连接所有房间
+    for a, b in build_room_connections(valid_rooms, loop_edges, rng):
+        carve_path(centers[a][0], centers[a][1], centers[b][0], centers[b][1])
 
-    while unconnected:
-        target = unconnected.pop(0)
-        nearest = min(connected, key=lambda c: (c[0] - target[0]) ** 2 + (c[1] - target[1]) ** 2)
-        carve_path(nearest[0], nearest[1], target[0], target[1])
-        connected.append(target)
+    # 预先计算房间编号层，供死胡同清理和连接图共用
+    room_index = build_room_index(width, height, valid_rooms)
 
     # 清理死胡同走廊（只连接一个房间的走廊段）
     def remove_dead_ends():
-        """移除死胡同走廊"""
-        changed = True
-        iterations = 0
-        max_iterations = 50  # 防止无限循环
-
-        while changed and iterations < max_iterations:
-            changed = False
-            iterations += 1
-
-            for y in range(1, height - 1):
-                for x in range(1, width - 1):
-                    # 只处理走廊（非房间内的地板）
-                    if dungeon[y][x] == TILE_EMPTY:
-                        # 检查是否在房间内
-                        in_room = False
-                        for room in valid_rooms:
-                            if (room["x"] <= x < room["x"] + room["width"] and
-                                    room["y"] <= y < room["y"] + room["height"]):
-                                in_room = True
-                                break
-
-                        # 如果不在房间内，检查相邻可通行格子数
-                        if not in_room:
-                            neighbors = 0
-                            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                                nx, ny = x + dx, y + dy
-                                if 0 <= nx < width and 0 <= ny < height:
-                                    if dungeon[ny][nx] == TILE_EMPTY:
-                                        neighbors += 1
-
-                            # 如果只有1个或0个邻居，说明是死胡同，删除
-                            if neighbors <= 1:
-                                dungeon[y][x] = TILE_WALL
-                                changed = True
+        """移除死胡同走廊：从初始死胡同出发，只复查被移除格子的邻居"""
+        if width < 3 or height < 3:
+            return
+
+        # 只处理内部格子（不含地图最外圈），房间内的地板不参与清理
+        prunable = np.zeros((height, width), dtype=bool)
+        prunable[1:-1, 1:-1] = True
+        prunable &= room_index < 0
+
+        floor = dungeon == TILE_EMPTY
+        neighbors = np.zeros((height, width), dtype=np.int8)
+        neighbors[1:, :] += floor[:-1, :]
+        neighbors[:-1, :] += floor[1:, :]
+        neighbors[:, 1:] += floor[:, :-1]
+        neighbors[:, :-1] += floor[:, 1:]
+
+        # 如果只有1个或0个邻居，说明是死胡同
+        ys, xs = np.nonzero(floor & prunable & (neighbors <= 1))
+        queue = deque(zip(xs.tolist(), ys.tolist()))
+        while queue:
+            x, y = queue.popleft()
+            if dungeon[y, x] != TILE_EMPTY:
+                continue
+            count = 0
+            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                if dungeon[y + dy, x + dx] == TILE_EMPTY:
+                    count += 1
+            if count > 1:
+                continue
+
+            dungeon[y, x] = TILE_WALL
+            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                nx, ny = x + dx, y + dy
+                if prunable[ny, nx] and dungeon[ny, nx] == TILE_EMPTY:
+                    queue.append((nx, ny))
 
     # 执行死胡同清理
     remove_dead_ends()
@@ -255,63 +234,348 @@ def generate_dungeon(width, height, rooms_min=6, rooms_max=16):
         cy = r["y"] + r["height"] // 2
         room_centers_grid.append((cx, cy, r))
 
-    # 使用BFS判断两点是否可达
-    def bfs_connected(dng, w, h, x1, y1, x2, y2):
-        """BFS检查两点是否通过TILE_EMPTY连通"""
-        if not (0 <= x1 < w and 0 <= y1 < h and 0 <= x2 < w and 0 <= y2 < h):
-            return False
-        if dng[y1][x1] != TILE_EMPTY or dng[y2][x2] != TILE_EMPTY:
-            return False
+    # 构建房间之间的连接图（一次连通域标记 + 走廊邻接提取）
+    graph = build_room_graph(dungeon, valid_rooms, room_index)
 
-        visited = [[False] * w for _ in range(h)]
-        queue = deque([(x1, y1)])
-        visited[y1][x1] = True
+    return dungeon, valid_rooms, graph, room_centers_grid
 
-        while queue:
-            x, y = queue.popleft()
-            if x == x2 and y == y2:
-                return True
 
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < w and 0 <= ny < h:
-                    if not visited[ny][nx] and dng[ny][nx] == TILE_EMPTY:
-                        visited[ny][nx] = True
-                        queue.append((nx, ny))
-        return False
+def _find(parent, i):
+    """并查集查找（路径减半）"""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
 
-    # 构建房间之间的连接图
-    graph = {i: [] for i in range(len(valid_rooms))}
-    for i in range(len(valid_rooms)):
-        for j in range(i + 1, len(valid_rooms)):
-            cx1, cy1 = room_centers_grid[i][0], room_centers_grid[i][1]
-            cx2, cy2 = room_centers_grid[j][0], room_centers_grid[j][1]
-            if bfs_connected(dungeon, width, height, cx1, cy1, cx2, cy2):
-                graph[i].append(j)
-                graph[j].append(i)
 
-    return dungeon, valid_rooms, graph, room_centers_grid
+def _union(parent, a, b):
+    """并查集合并，保留较小的根"""
+    ra, rb = _find(parent, a), _find(parent, b)
+    if ra != rb:
+        if ra < rb:
+            parent[rb] = ra
+        else:
+            parent[ra] = rb
+
+
+def build_room_connections(rooms, loop_edges=0, rng=None):
+    """
+    Kruskal 最小生成树连接房间，候选边只取容器网格上的邻近房间：
+    先取 8 邻域（半径 1），仍不连通时逐圈扩大半径，只补充跨连通分量的边。
+    返回房间编号对列表（生成树的边在前，随后是 loop_edges 条回路边）
+    """
+    rng = random if rng is None else rng
+    count = len(rooms)
+    if count < 2:
+        return []
+
+    centers = [(r["x"] + r["width"] // 2, r["y"] + r["height"] // 2) for r in rooms]
+    by_cell = {(r["grid_x"], r["grid_y"]): index for index, r in enumerate(rooms)}
+    max_radius = max(max(abs(gx) for gx, _ in by_cell), max(abs(gy) for _, gy in by_cell)) + 1
+
+    def squared_distance(a, b):
+        return (centers[a][0] - centers[b][0]) ** 2 + (centers[a][1] - centers[b][1]) ** 2
+
+    parent = list(range(count))
+    components = count
+    tree_edges = []
+    spare_edges = []  # 未进入生成树的候选边，用于回路
+
+    radius = 1
+    while components > 1:
+        # 只枚举切比雪夫距离恰好为 radius 的一圈，各边只计一次（a < b）
+        candidates = []
+        for index, room in enumerate(rooms):
+            gx, gy = room["grid_x"], room["grid_y"]
+            for dy in range(-radius, radius + 1):
+                for dx in range(-radius, radius + 1):
+                    if max(abs(dx), abs(dy)) != radius:
+                        continue
+                    other = by_cell.get((gx + dx, gy + dy))
+                    if other is not None and other > index:
+                        candidates.append((squared_distance(index, other), index, other))
+
+        candidates.sort()
+        for _, a, b in candidates:
+            if _find(parent, a) != _find(parent, b):
+                _union(parent, a, b)
+                tree_edges.append((a, b))
+                components -= 1
+            elif radius == 1:
+                spare_edges.append((a, b))
+
+        radius += 1
+        if radius > max_radius and components > 1:
+            # 网格坐标异常（如紧急房间重叠）时，直接按编号串联剩余分量
+            for index in range(1, count):
+                if _find(parent, 0) != _find(parent, index):
+                    _union(parent, 0, index)
+                    tree_edges.append((0, index))
+            break
+
+    loops = rng.sample(spare_edges, min(loop_edges, len(spare_edges))) if loop_edges > 0 else []
+    return tree_edges + loops
+
+
+def label_regions(mask):
+    """
+    单遍连通域标记（四连通）
+    先按行提取连续区段，再用并查集合并上下重叠的区段，
+    返回 (labels, count)：labels 与 mask 同形，背景为 0，连通域编号 1..count
+    """
+    height, width = mask.shape
+    labels = np.zeros((height, width), dtype=np.int32)
+    if height == 0 or width == 0:
+        return labels, 0
+
+    # 每行的区段 [start, end)，按行优先顺序排列
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    run_rows, run_starts = np.nonzero(edges == 1)
+    run_ends = np.nonzero(edges == -1)[1]
+    run_rows = run_rows.tolist()
+    run_starts = run_starts.tolist()
+    run_ends = run_ends.tolist()
+
+    num_runs = len(run_rows)
+    parent = list(range(num_runs))
+
+    # 双指针合并相邻两行中列范围重叠的区段
+    prev_begin, prev_end = 0, 0  # 上一行区段在列表中的范围
+    cur_begin = 0
+    while cur_begin < num_runs:
+        row = run_rows[cur_begin]
+        cur_end = cur_begin
+        while cur_end < num_runs and run_rows[cur_end] == row:
+            cur_end += 1
+
+        if prev_end > prev_begin and run_rows[prev_begin] == row - 1:
+            i, j = prev_begin, cur_begin
+            while i < prev_end and j < cur_end:
+                if run_starts[i] < run_ends[j] and run_starts[j] < run_ends[i]:
+                    _union(parent, i, j)
+                if run_ends[i] < run_ends[j]:
+                    i += 1
+                else:
+                    j += 1
+
+        prev_begin, prev_end = cur_begin, cur_end
+        cur_begin = cur_end
+
+    # 压缩根编号为 1..count 并写回标签
+    root_label = {}
+    for k in range(num_runs):
+        root = _find(parent, k)
+        label = root_label.get(root)
+        if label is None:
+            label = len(root_label) + 1
+            root_label[root] = label
+        labels[run_rows[k], run_starts[k]:run_ends[k]] = label
+
+    return labels, len(root_label)
+
+
+def chunk_cache_capacity(screen_w, screen_h):
+    """屏幕最多覆盖的块数（不对齐时每个方向多一块）乘以 CHUNK_CACHE_SCREENS"""
+    chunk_px = CHUNK_TILES * TILE_SIZE
+    return ((math.ceil(screen_w / chunk_px) + 1) * (math.ceil(screen_h / chunk_px) + 1)
+            * CHUNK_CACHE_SCREENS)
+
+
+def bfs_distance_field(tiles, sources, max_distance=None):
+    """
+    多源 BFS 距离场（四连通，按格计步）
+    sources 为 (tx, ty) 列表；返回 int32 数组，不可达或超出 max_distance 的格子为 -1
+    """
+    if max_distance is None:
+        return _bfs_layers(tiles, sources)
+    window, (x0, y0) = bfs_distance_window(tiles, sources, max_distance)
+    dist = np.full(tiles.shape, -1, dtype=np.int32)
+    dist[y0:y0 + window.shape[0], x0:x0 + window.shape[1]] = window
+    return dist
+
+
+def bfs_distance_window(tiles, sources, max_distance):
+    """
+    限定半径的 BFS：max_distance 步内走不出源点包围盒外扩 max_distance 格的窗口，
+    只在该窗口内搜索，耗时与半径而非地图面积成正比
+    返回 (窗口内的距离场, 窗口左上角 (x0, y0))
+    """
+    height, width = tiles.shape
+    points = [(tx, ty) for tx, ty in sources if 0 <= tx < width and 0 <= ty < height]
+    if not points:
+        return np.full((0, 0), -1, dtype=np.int32), (0, 0)
+    x0 = max(min(tx for tx, _ in points) - max_distance, 0)
+    y0 = max(min(ty for _, ty in points) - max_distance, 0)
+    x1 = min(max(tx for tx, _ in points) + max_distance + 1, width)
+    y1 = min(max(ty for _, ty in points) + max_distance + 1, height)
+    window = _bfs_layers(tiles[y0:y1, x0:x1],
+                         [(tx - x0, ty - y0) for tx, ty in points], max_distance)
+    return window, (x0, y0)
+
+
+def _bfs_layers(tiles, sources, max_distance=None):
+    """逐层扩展的 BFS 本体，在给定的（可能是裁剪后的）格子数组上计算距离场"""
+    height, width = tiles.shape
+    dist = np.full(height * width, -1, dtype=np.int32)
+    # 按一维下标访问，减少元组开销
+    passable = (tiles == TILE_EMPTY).ravel().tolist()
+
+    frontier = []
+    for tx, ty in sources:
+        if 0 <= tx < width and 0 <= ty < height:
+            index = ty * width + tx
+            if passable[index] and dist[index] < 0:
+                dist[index] = 0
+                frontier.append(index)
+
+    visited = bytearray(height * width)
+    for index in frontier:
+        visited[index] = 1
+
+    # 逐层扩展，每层一次性写回距离
+    step = 0
+    while frontier and (max_distance is None or step < max_distance):
+        step += 1
+        next_frontier = []
+        for index in frontier:
+            x = index % width
+            if x > 0:
+                n = index - 1
+                if not visited[n] and passable[n]:
+                    visited[n] = 1
+                    next_frontier.append(n)
+            if x < width - 1:
+                n = index + 1
+                if not visited[n] and passable[n]:
+                    visited[n] = 1
+                    next_frontier.append(n)
+            if index >= width:
+                n = index - width
+                if not visited[n] and passable[n]:
+                    visited[n] = 1
+                    next_frontier.append(n)
+            n = index + width
+            if n < height * width and not visited[n] and passable[n]:
+                visited[n] = 1
+                next_frontier.append(n)
+        if next_frontier:
+            dist[next_frontier] = step
+        frontier = next_frontier
+
+    return dist.reshape(height, width)
+
+
+def build_room_index(width, height, rooms):
+    """每格所属房间编号（-1 表示走廊或墙）"""
+    room_index = np.full((height, width), -1, dtype=np.int16)
+    for index, room in enumerate(rooms):
+        room_index[max(room["y"], 0):room["y"] + room["height"],
+                   max(room["x"], 0):room["x"] + room["width"]] = index
+    return room_index
+
+
+def build_room_graph(dungeon, rooms, room_index=None):
+    """
+    构建房间邻接图：对走廊（房间外的地板）做一次连通域标记，
+    同一段走廊触及的房间互相邻接；直接相接的房间也视为邻接
+    """
+    height, width = dungeon.shape
+    graph = {i: [] for i in range(len(rooms))}
+
+    if room_index is None:
+        room_index = build_room_index(width, height, rooms)
+
+    corridor_labels, _ = label_regions((dungeon == TILE_EMPTY) & (room_index < 0))
+
+    def link(i, j):
+        if j not in graph[i]:
+            graph[i].append(j)
+            graph[j].append(i)
+
+    # 检查每个房间外围一圈：出现的走廊编号，以及直接重叠或贴边的房间
+    touching = {}
+    for index, room in enumerate(rooms):
+        x1, y1 = max(room["x"] - 1, 0), max(room["y"] - 1, 0)
+        x2 = min(room["x"] + room["width"] + 1, width)
+        y2 = min(room["y"] + room["height"] + 1, height)
+        ring = corridor_labels[y1:y2, x1:x2]
+        for label in np.unique(ring[ring > 0]).tolist():
+            touching.setdefault(label, []).append(index)
+        neighbours = room_index[y1:y2, x1:x2]
+        for other in np.unique(neighbours[neighbours >= 0]).tolist():
+            if other != index:
+                link(index, other)
+
+    for members in touching.values():
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                link(members[a], members[b])
+
+    return graph
 
 
 class Map:
     """地牢地图类"""
 
-    def __init__(self, width, height):
+    # 配色方案
+    FLOOR_COLOR = (200, 200, 200)
+    WALL_COLOR = (50, 50, 50)
+
+    def __init__(self, width, height, rng=None, **generation_options):
         self.width = width
         self.height = height
-        result = generate_dungeon(width, height)
+        # 房间容器网格尺寸（用于判断边缘房间）
+        self.grid_width, self.grid_height = room_grid_shape(width, height)
+        result = generate_dungeon(width, height, rng=rng, **generation_options)
         if not result or len(result[1]) == 0:
             raise RuntimeError("Failed to generate any valid rooms")
 
-        self.tiles, self.rooms, self.room_graph, self.room_centers_grid = result
+        self._init_layers(*result)
         self.start_room_index = None
-        self.player_position = self.find_start_position()
+        self.player_position = self.find_start_position(rng)
         self.room_centers = self.find_all_room_centers()
 
-    def find_start_position(self):
+    @classmethod
+    def from_layers(cls, tiles, rooms, room_graph, room_centers_grid,
+                    start_room_index=0, end_position=None):
+        """用已有的地砖层和房间数据构建地图（不重新生成，用于读档）"""
+        game_map = cls.__new__(cls)
+        game_map.height, game_map.width = tiles.shape
+        game_map.grid_width, game_map.grid_height = room_grid_shape(game_map.width, game_map.height)
+        game_map._init_layers(tiles, rooms, room_graph, room_centers_grid)
+        game_map.end_position = end_position
+        game_map.start_room_index = start_room_index
+        start_room = rooms[start_room_index]
+        cx = start_room["x"] + start_room["width"] // 2
+        cy = start_room["y"] + start_room["height"] // 2
+        game_map.player_position = (cx * TILE_SIZE + TILE_SIZE // 2,
+                                    cy * TILE_SIZE + TILE_SIZE // 2)
+        game_map.room_centers = game_map.find_all_room_centers()
+        return game_map
+
+    def _init_layers(self, tiles, rooms, room_graph, room_centers_grid):
+        """设置地砖层、房间数据及派生的查询/渲染结构"""
+        self.tiles = tiles
+        self.rooms = rooms
+        self.room_graph = room_graph
+        self.room_centers_grid = room_centers_grid
+        # 终点像素坐标（由游戏引擎选定后写入，可随地图一起存档）
+        self.end_position = None
+        # 每格所属房间编号（-1 表示走廊或墙），用于 O(1) 房间查询
+        self.room_index = build_room_index(self.width, self.height, rooms)
+        # 分块渲染缓存：(块x, 块y) -> Surface，容量由绘制时的屏幕尺寸决定
+        self._chunk_cache = OrderedDict()
+        self._chunk_capacity = 0
+
+    def find_start_position(self, rng=None):
         """选择边缘房间作为起始点"""
-        edge_rooms = [r for r in self.rooms if r["grid_x"] in [0, 3] or r["grid_y"] in [0, 3]]
-        start_room = random.choice(edge_rooms) if edge_rooms else self.rooms[0]
+        rng = random if rng is None else rng
+        last_x, last_y = self.grid_width - 1, self.grid_height - 1
+        edge_rooms = [r for r in self.rooms
+                      if r["grid_x"] in [0, last_x] or r["grid_y"] in [0, last_y]]
+        start_room = rng.choice(edge_rooms) if edge_rooms else self.rooms[0]
         self.start_room_index = self.rooms.index(start_room)
 
         cx = start_room["x"] + start_room["width"] // 2
@@ -339,47 +603,75 @@ class Map:
         ty = int(y // TILE_SIZE)
         if tx < 0 or ty < 0 or tx >= self.width or ty >= self.height:
             return False
-        tile = self.tiles[ty][tx]
-        return tile == TILE_EMPTY
+        return self.tiles[ty, tx] == TILE_EMPTY
+
+    def room_at(self, x, y):
+        """返回像素坐标所在房间的编号，不在任何房间内返回 -1"""
+        tx = int(x // TILE_SIZE)
+        ty = int(y // TILE_SIZE)
+        if tx < 0 or ty < 0 or tx >= self.width or ty >= self.height:
+            return -1
+        return int(self.room_index[ty, tx])
 
     def get_room_centers(self):
         """返回所有房间中心像素坐标"""
         return self.room_centers
 
-    # 修改 map.py 中的 render 方法
+    # ---------------- 分块渲染缓存 ----------------
+
+    def invalidate_tile(self, tx, ty):
+        """地砖被修改后调用，使其所在块的缓存失效"""
+        self.invalidate_chunk(tx // CHUNK_TILES, ty // CHUNK_TILES)
+
+    def invalidate_chunk(self, cx, cy):
+        """使单个块的缓存失效，下次绘制时重建"""
+        self._chunk_cache.pop((cx, cy), None)
+
+    def invalidate_all_chunks(self):
+        """清空所有块缓存"""
+        self._chunk_cache.clear()
+
+    def _get_chunk(self, cx, cy):
+        """取出块表面（LRU），不存在时按需光栅化"""
+        cache = self._chunk_cache
+        surface = cache.get((cx, cy))
+        if surface is not None:
+            cache.move_to_end((cx, cy))
+            return surface
+
+        x0 = cx * CHUNK_TILES
+        y0 = cy * CHUNK_TILES
+        block = self.tiles[y0:y0 + CHUNK_TILES, x0:x0 + CHUNK_TILES]
+
+        # 先生成每格一像素的小图，再按 TILE_SIZE 最近邻放大
+        colors = np.where((block == TILE_EMPTY)[:, :, None],
+                          np.array(self.FLOOR_COLOR, dtype=np.uint8),
+                          np.array(self.WALL_COLOR, dtype=np.uint8))
+        small = pygame.surfarray.make_surface(colors.transpose(1, 0, 2))
+        surface = pygame.transform.scale(
+            small, (block.shape[1] * TILE_SIZE, block.shape[0] * TILE_SIZE))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+
+        cache[(cx, cy)] = surface
+        while len(cache) > self._chunk_capacity:
+            cache.popitem(last=False)
+        return surface
+
     def render(self, screen, camera_x, camera_y):
-        """减少渲染范围，只绘制可见区域"""
+        """只绘制与相机重叠的预渲染块，每帧几次 blit"""
         screen_w = screen.get_width()
         screen_h = screen.get_height()
-
-        # 精确计算可见区域（减少冗余渲染）
-        start_x = max(0, int((camera_x) // TILE_SIZE) - 1)
-        start_y = max(0, int((camera_y) // TILE_SIZE) - 1)
-        end_x = min(self.width, int((camera_x + screen_w) // TILE_SIZE) + 2)
-        end_y = min(self.height, int((camera_y + screen_h) // TILE_SIZE) + 2)
-
-        # 配色方案常量提取到类级别
-        FLOOR_COLOR = (200, 200, 200)
-        WALL_COLOR = (50, 50, 50)
-
-        # 使用局部变量访问 tiles 提高速度
-        tiles = self.tiles
-        tile_size = TILE_SIZE
-
-        # 减少循环内的计算量
-        for y in range(start_y, end_y):
-            tile_row = tiles[y]
-            for x in range(start_x, end_x):
-                if tile_row[x] == TILE_EMPTY:
-                    color = FLOOR_COLOR
-                else:
-                    color = WALL_COLOR
-
-                # 提前计算矩形位置
-                rect_x = x * tile_size - camera_x
-                rect_y = y * tile_size - camera_y
-
-                pygame.draw.rect(screen, color,
-                                 (rect_x, rect_y, tile_size, tile_size))
-
-        # 保持边界填充逻辑...
\ No newline at end of file
+        chunk_px = CHUNK_TILES * TILE_SIZE
+        self._chunk_capacity = chunk_cache_capacity(screen_w, screen_h)
+
+        # 与屏幕重叠的块范围
+        start_cx = max(0, int(camera_x // chunk_px))
+        start_cy = max(0, int(camera_y // chunk_px))
+        end_cx = min((self.width - 1) // CHUNK_TILES, int((camera_x + screen_w) // chunk_px))
+        end_cy = min((self.height - 1) // CHUNK_TILES, int((camera_y + screen_h) // chunk_px))
+
+        for cy in range(start_cy, end_cy + 1):
+            for cx in range(start_cx, end_cx + 1):
+                screen.blit(self._get_chunk(cx, cy),
+                            (int(cx * chunk_px - camera_x), int(cy * chunk_px - camera_y)))
@@ -0,0 +1,122 @@
+"""
+地牢地图存档格式（二进制，带版本号）
+
+文件布局（小端）：
+    头部    : 魔数 b"DUNG"、版本、地砖编码、宽、高、元数据长度、地砖块偏移和长度
+    元数据  : UTF-8 JSON（房间、room_graph、room_centers_grid、起点/终点）
+    地砖块  : 按 64 字节对齐
+
+地砖编码：
+    TILE_ENCODING_RAW    每格一个 uint8（默认），读取时直接内存映射，不做解析也不复制
+    TILE_ENCODING_BITS   只有地板/墙两种地砖时按位打包（1 = 墙），文件小 8 倍，
+                         但读取时要把整张地图解包成新数组，适合归档而不是快速载入
+"""
+import json
+import struct
+import numpy as np
+from map import Map, TILE_EMPTY, TILE_WALL
+
+MAGIC = b"DUNG"
+FORMAT_VERSION = 1
+
+TILE_ENCODING_RAW = 0
+TILE_ENCODING_BITS = 1
+
+# 魔数、版本、编码、保留、宽、高、元数据长度、地砖块偏移、地砖块长度
+_HEADER = struct.Struct("<4sHBBIIIQQ")
+_TILE_ALIGN = 64
+
+
+def save_dungeon(game_map, path, encoding=TILE_ENCODING_RAW):
+    """将地图写入存档文件；默认原始编码（可内存映射载入），归档时可选按位编码"""
+    tiles = np.ascontiguousarray(game_map.tiles, dtype=np.uint8)
+    height, width = tiles.shape
+
+    if encoding == TILE_ENCODING_BITS:
+        if not np.all((tiles == TILE_EMPTY) | (tiles == TILE_WALL)):
+            raise ValueError("Bit-packed encoding only supports floor and wall tiles")
+        tile_block = np.packbits(tiles == TILE_WALL).tobytes()
+    elif encoding == TILE_ENCODING_RAW:
+        tile_block = tiles.tobytes()
+    else:
+        raise ValueError(f"Unknown tile encoding: {encoding}")
+
+    # room_centers_grid 中的房间对象以房间编号保存
+    room_ids = {id(room): index for index, room in enumerate(game_map.rooms)}
+    metadata = {
+        "rooms": game_map.rooms,
+        "room_graph": {str(k): v for k, v in game_map.room_graph.items()},
+        "room_centers_grid": [[cx, cy, room_ids[id(room)]]
+                              for cx, cy, room in game_map.room_centers_grid],
+        "start_room_index": game_map.start_room_index,
+        "player_position": list(game_map.player_position),
+        "end_position": list(game_map.end_position) if game_map.end_position else None
+    }
+    meta_bytes = json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    tile_offset = _HEADER.size + len(meta_bytes)
+    tile_offset += -tile_offset % _TILE_ALIGN
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, encoding, 0, width, height,
+                             len(meta_bytes), tile_offset, len(tile_block)))
+        f.write(meta_bytes)
+        f.write(b"\0" * (tile_offset - _HEADER.size - len(meta_bytes)))
+        f.write(tile_block)
+
+
+def read_header(path):
+    """读取并校验存档头部，返回字段字典"""
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        raise ValueError(f"Truncated dungeon file: {path}")
+    magic, version, encoding, _, width, height, meta_length, tile_offset, tile_length = \
+        _HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"Not a dungeon file: {path}")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dungeon format version {version} (expected {FORMAT_VERSION})")
+    return {
+        "encoding": encoding,
+        "width": width,
+        "height": height,
+        "meta_length": meta_length,
+        "tile_offset": tile_offset,
+        "tile_length": tile_length
+    }
+
+
+def load_dungeon(path):
+    """
+    读取存档并返回 Map：只有原始编码的地砖块是零拷贝载入（写时复制的内存映射），
+    按位编码的地砖块需要整张解包
+    """
+    header = read_header(path)
+    width, height = header["width"], header["height"]
+
+    with open(path, "rb") as f:
+        f.seek(_HEADER.size)
+        metadata = json.loads(f.read(header["meta_length"]).decode("utf-8"))
+
+    if header["encoding"] == TILE_ENCODING_RAW:
+        tiles = np.memmap(path, dtype=np.uint8, mode="c",
+                          offset=header["tile_offset"], shape=(height, width))
+    elif header["encoding"] == TILE_ENCODING_BITS:
+        packed = np.memmap(path, dtype=np.uint8, mode="r",
+                           offset=header["tile_offset"], shape=(header["tile_length"],))
+        walls = np.unpackbits(packed, count=width * height).reshape(height, width)
+        tiles = np.where(walls, TILE_WALL, TILE_EMPTY).astype(np.uint8)
+    else:
+        raise ValueError(f"Unknown tile encoding: {header['encoding']}")
+
+    rooms = metadata["rooms"]
+    room_graph = {int(k): v for k, v in metadata["room_graph"].items()}
+    room_centers_grid = [(cx, cy, rooms[index]) for cx, cy, index in metadata["room_centers_grid"]]
+    end_position = tuple(metadata["end_position"]) if metadata["end_position"] else None
+
+    game_map = Map.from_layers(tiles, rooms, room_graph, room_centers_grid,
+                               start_room_index=metadata["start_room_index"],
+                               end_position=end_position)
+    game_map.player_position = tuple(metadata["player_position"])
+    return game_map
@@ -21,6 +21,8 @@ class MonsterLoader:
         self.sprite_frames = defaultdict(dict)
         self.loaded = False
         self.sprite_size = (64, 64)
+        # (怪物类型, 动画) -> 水平翻转后的帧，朝左的怪物共用，只翻转一次
+        self.mirrored_frames = {}
 
     # =========================================
     # 清洗怪物类型，保证与 Monster 一致
@@ -172,11 +174,23 @@ class MonsterLoader:
 
         return anims[a]
 
+    def get_mirrored_animation(self, monster_type, anim_type):
+        """朝左的动画帧：首次使用时把 get_monster_animation 的结果水平翻转并缓存"""
+        key = (monster_type.lower(), anim_type.lower())
+        frames = self.mirrored_frames.get(key)
+        if frames is None:
+            frames = [pygame.transform.flip(frame, True, False)
+                      for frame in self.get_monster_animation(monster_type, anim_type)]
+            self.mirrored_frames[key] = frames
+        return frames
+
     # =========================================
     # 随机返回一个正确的怪物类型（增加空值保护）
     # =========================================
-    def get_random_monster_type(self):
+    def get_random_monster_type(self, rng=None):
         if not self.sprite_frames:
             print("⚠️ 没有可用的怪物类型！")
             return None  # 或创建默认类型
-        return random.choice(list(self.sprite_frames.keys()))
\ No newline at end of file
+        # 按名称排序，同一随机数流在不同机器上选出相同的怪物
+        rng = random if rng is None else rng
+        return rng.choice(sorted(self.sprite_frames.keys()))
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""
+怪物组件存储（结构数组）：所有怪物的位置、速度、生命值、状态、所在房间
+和动画游标都保存在 NumPy 数组中，移动和索敌按批量向量运算完成
+Monster 对象只是指向某一行的轻量视图，负责精灵和绘制；
+发射的小点由 projectiles.ProjectileSystem 统一管理
+"""
+import numpy as np
+
+# 动画状态编码（与 MonsterLoader 的动画名对应）
+STATE_IDLE = 0
+STATE_RUN = 1
+STATE_ATTACK = 2
+STATE_NAMES = ("idle", "run", "attack")
+
+# 远程怪物类型
+RANGED_TYPES = ("dracula", "mummy")
+
+# 怪物参数
+MONSTER_MAX_HEALTH = 10
+MELEE_SPEED = 1.0
+RANGED_APPROACH_SPEED = 0.8
+RANGED_RETREAT_SPEED = 0.5
+RANGED_ATTACK_RANGE = 200
+RANGED_ATTACK_COOLDOWN = 1500  # 毫秒
+ATTACK_ANIMATION_MS = 300      # 发射后播放攻击动画的时长
+FRAME_DELAY = 6                # 每隔多少帧切换一帧动画
+
+
+def _grow(array, capacity):
+    """把数组扩容到 capacity 行，保留原有数据"""
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class MonsterStore:
+    """怪物的结构数组存储，行号即怪物编号（死亡后不复用）"""
+
+    # 字段名 -> (dtype, 每行形状)
+    MONSTER_FIELDS = {
+        "x": (np.float64, ()),
+        "y": (np.float64, ()),
+        "prev_x": (np.float64, ()),       # 上一模拟步的位置（渲染插值）
+        "prev_y": (np.float64, ()),
+        "vx": (np.float32, ()),           # 上一帧的位移
+        "vy": (np.float32, ()),
+        "health": (np.int16, ()),
+        "alive": (np.bool_, ()),
+        "active": (np.bool_, ()),         # 玩家在怪物房间内
+        "ranged": (np.bool_, ()),
+        "room": (np.int32, ()),
+        "bounds": (np.float64, (4,)),     # 房间像素边界 (left, top, right, bottom)
+        "state": (np.int8, ()),
+        "facing_left": (np.bool_, ()),
+        "frame": (np.int32, ()),          # 动画游标
+        "frame_tick": (np.int32, ()),
+        "last_attack": (np.int64, ()),
+    }
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self._capacity = 0
+        self._reserve(capacity)
+
+    def _reserve(self, capacity):
+        if capacity <= self._capacity:
+            return
+        for name, (dtype, shape) in self.MONSTER_FIELDS.items():
+            old = getattr(self, name, np.zeros((0,) + shape, dtype=dtype))
+            setattr(self, name, _grow(old, capacity))
+        self._capacity = capacity
+
+    # ---------------- 怪物 ----------------
+
+    def add(self, x, y, room_index, room_bounds, ranged):
+        """添加一个怪物，返回行号"""
+        if self.count == self._capacity:
+            self._reserve(self._capacity * 2)
+        i = self.count
+        self.count += 1
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.vx[i] = self.vy[i] = 0
+        self.health[i] = MONSTER_MAX_HEALTH
+        self.alive[i] = True
+        self.active[i] = False
+        self.ranged[i] = ranged
+        self.room[i] = room_index
+        self.bounds[i] = room_bounds
+        self.state[i] = STATE_IDLE
+        self.facing_left[i] = False
+        self.frame[i] = self.frame_tick[i] = 0
+        self.last_attack[i] = 0
+        return i
+
+    def kill(self, index):
+        """标记怪物死亡"""
+        self.alive[index] = False
+        self.active[index] = False
+
+    def snapshot(self):
+        """模拟步开始前记录位置，供渲染插值"""
+        self.prev_x[:self.count] = self.x[:self.count]
+        self.prev_y[:self.count] = self.y[:self.count]
+
+    def visible(self, left, top, right, bottom, alpha=1.0):
+        """插值位置落在 [left, right) x [top, bottom) 内的存活怪物行号（绘制前按相机裁剪）"""
+        n = self.count
+        x = self.prev_x[:n] + (self.x[:n] - self.prev_x[:n]) * alpha
+        y = self.prev_y[:n] + (self.y[:n] - self.prev_y[:n]) * alpha
+        return np.flatnonzero(self.alive[:n] & (x >= left) & (x < right) & (y >= top) & (y < bottom))
+
+    def update_activation(self, indices, player_room):
+        """玩家进入/离开怪物房间时激活/休眠，切换 run/idle 动画"""
+        active = (self.room[indices] == player_room) & self.alive[indices]
+        changed = indices[active != self.active[indices]]
+        self.active[indices] = active
+        self.state[changed] = np.where(self.active[changed], STATE_RUN, STATE_IDLE)
+        self.frame[changed] = 0
+
+    def steer(self, indices, player_x, player_y, navigation, now):
+        """
+        近战与远程怪物的批量移动（只处理激活的怪物），
+        navigation 提供玩家距离场的下降方向，为空时直线追击
+        返回本帧需要发射小点的怪物行号
+        """
+        indices = indices[self.active[indices]]
+        if indices.size == 0:
+            return indices
+        x = self.x[indices]
+        y = self.y[indices]
+        dx = player_x - x
+        dy = player_y - y
+        dist = np.hypot(dx, dy)
+        safe_dist = np.where(dist > 0, dist, 1.0)
+        ux = dx / safe_dist
+        uy = dy / safe_dist
+        self.facing_left[indices] = dx < 0
+
+        step_x = np.zeros_like(x)
+        step_y = np.zeros_like(y)
+
+        # 近战：沿距离场追击，不可用时直线追击，越近越快
+        melee = ~self.ranged[indices] & (dist > 3)
+        speed = MELEE_SPEED * (1.0 + np.minimum(0.5, (100 - dist) / 200))
+        if navigation is not None:
+            dir_x, dir_y, dir_valid = navigation.directions_to_player(x, y)
+            chase_x = np.where(dir_valid, dir_x, ux)
+            chase_y = np.where(dir_valid, dir_y, uy)
+        else:
+            chase_x, chase_y = ux, uy
+        step_x[melee] = (chase_x * speed)[melee]
+        step_y[melee] = (chase_y * speed)[melee]
+
+        # 远程：冷却结束且在射程内时发射，太近后退，太远靠近
+        ranged = self.ranged[indices]
+        shoot = ranged & (dist < RANGED_ATTACK_RANGE) & (now - self.last_attack[indices] > RANGED_ATTACK_COOLDOWN)
+        retreat = ranged & ~shoot & (dist < RANGED_ATTACK_RANGE * 0.7) & (dist > 0)
+        approach = ranged & ~shoot & (dist > RANGED_ATTACK_RANGE)
+        step_x[retreat] = -(ux * RANGED_RETREAT_SPEED)[retreat]
+        step_y[retreat] = -(uy * RANGED_RETREAT_SPEED)[retreat]
+        step_x[approach] = (chase_x * RANGED_APPROACH_SPEED)[approach]
+        step_y[approach] = (chase_y * RANGED_APPROACH_SPEED)[approach]
+
+        new_x = x + step_x
+        new_y = y + step_y
+        # 远程怪物限制在房间内
+        bounds = self.bounds[indices]
+        new_x = np.where(ranged, np.clip(new_x, bounds[:, 0], bounds[:, 2]), new_x)
+        new_y = np.where(ranged, np.clip(new_y, bounds[:, 1], bounds[:, 3]), new_y)
+
+        self.vx[indices] = new_x - x
+        self.vy[indices] = new_y - y
+        self.x[indices] = new_x
+        self.y[indices] = new_y
+
+        shooters = indices[shoot]
+        self.last_attack[shooters] = now
+        return shooters
+
+    def advance_animation(self, indices, now, ticks=1):
+        """推进动画游标；降频更新时 ticks 为跳过的帧数"""
+        attacking = self.ranged[indices] & (now - self.last_attack[indices] < ATTACK_ANIMATION_MS)
+        state = self.state[indices]
+        new_state = np.where(attacking, STATE_ATTACK,
+                             np.where(self.active[indices], STATE_RUN, state))
+        changed = new_state != state
+        self.state[indices] = new_state
+        frame = np.where(changed, 0, self.frame[indices])
+
+        tick = self.frame_tick[indices] + ticks
+        self.frame[indices] = frame + tick // FRAME_DELAY
+        self.frame_tick[indices] = tick % FRAME_DELAY
@@ -0,0 +1,129 @@
+"""
+导航服务：在 Map 之上计算并缓存整数距离场（BFS），
+供终点距离查询和追击玩家的怪物共用
+"""
+import numpy as np
+
+from map import TILE_EMPTY, TILE_SIZE, bfs_distance_field, bfs_distance_window
+
+# 玩家距离场的最大搜索半径（格），怪物只在附近追击，不必覆盖整张地图
+PLAYER_FIELD_RADIUS = 48
+
+# 8 个邻居方向（对角线只在两侧正交格都可通行时使用，避免穿墙角）
+_NEIGHBORS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+
+class NavigationService:
+    """距离场缓存：终点距离场只算一次，玩家距离场在玩家换格时重算"""
+
+    def __init__(self, game_map, player_radius=PLAYER_FIELD_RADIUS):
+        self.map = game_map
+        self.player_radius = player_radius
+        # 目标键 -> (目标格, 距离场)
+        self._fields = {}
+        self._goal_tile = None
+        self.player_field = None
+        # 玩家距离场：整图大小的缓冲区反复使用，换格时只清除上次搜索的窗口
+        self._player_tile = None
+        self._player_window = None
+
+    # ---------------- 距离场 ----------------
+
+    def field_to(self, key, tx, ty, max_distance=None):
+        """返回到目标格的距离场，目标格不变时直接复用缓存"""
+        cached = self._fields.get(key)
+        if cached is not None and cached[0] == (tx, ty):
+            return cached[1]
+        field = bfs_distance_field(self.map.tiles, [(tx, ty)], max_distance)
+        self._fields[key] = ((tx, ty), field)
+        return field
+
+    def set_goal(self, x, y):
+        """设置终点（像素坐标），终点距离场在首次查询时计算"""
+        self._goal_tile = (int(x // TILE_SIZE), int(y // TILE_SIZE))
+        self._fields.pop("goal", None)
+
+    def update_player(self, x, y):
+        """玩家移动后调用；只有换格时才重算玩家距离场"""
+        tile = (int(x // TILE_SIZE), int(y // TILE_SIZE))
+        if tile == self._player_tile:
+            return
+        self._player_tile = tile
+        if self.player_field is None:
+            self.player_field = np.full(self.map.tiles.shape, -1, dtype=np.int32)
+        elif self._player_window is not None:
+            self.player_field[self._player_window] = -1
+        window, (x0, y0) = bfs_distance_window(self.map.tiles, [tile], self.player_radius)
+        self._player_window = (slice(y0, y0 + window.shape[0]), slice(x0, x0 + window.shape[1]))
+        self.player_field[self._player_window] = window
+
+    def goal_field(self):
+        """到终点的完整距离场（格），未设置终点时返回 None"""
+        if self._goal_tile is None:
+            return None
+        return self.field_to("goal", *self._goal_tile)
+
+    def goal_distance(self, x, y):
+        """像素坐标到终点的步行距离（格），不可达返回 -1"""
+        field = self.goal_field()
+        if field is None:
+            return -1
+        return self._lookup(field, x, y)
+
+    def _lookup(self, field, x, y):
+        tx = int(x // TILE_SIZE)
+        ty = int(y // TILE_SIZE)
+        if 0 <= tx < self.map.width and 0 <= ty < self.map.height:
+            return int(field[ty, tx])
+        return -1
+
+    # ---------------- 追击方向 ----------------
+
+    def directions_to_player(self, xs, ys):
+        """
+        批量版追击方向：对每个像素坐标沿玩家距离场下降最快的方向取单位向量
+        返回 (ux, uy, valid)，valid 为假的位置（已与玩家同格或不在距离场内）
+        由调用方直线追击
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        ux = np.zeros(xs.shape)
+        uy = np.zeros(xs.shape)
+        field = self.player_field
+        if field is None or xs.size == 0:
+            return ux, uy, np.zeros(xs.shape, dtype=bool)
+
+        width, height = self.map.width, self.map.height
+        tiles = self.map.tiles
+        tx = np.floor_divide(xs, TILE_SIZE).astype(np.intp)
+        ty = np.floor_divide(ys, TILE_SIZE).astype(np.intp)
+        inside = (tx >= 0) & (tx < width) & (ty >= 0) & (ty < height)
+        cx = np.clip(tx, 0, width - 1)
+        cy = np.clip(ty, 0, height - 1)
+        current = np.where(inside, field[cy, cx], -1)
+
+        best_x = np.full(xs.shape, -1, dtype=np.intp)
+        best_y = np.full(xs.shape, -1, dtype=np.intp)
+        best_value = current.copy()
+        for dx, dy in _NEIGHBORS:
+            nx, ny = tx + dx, ty + dy
+            ok = inside & (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+            nxc = np.clip(nx, 0, width - 1)
+            nyc = np.clip(ny, 0, height - 1)
+            value = field[nyc, nxc]
+            ok &= (value >= 0) & (value < best_value)
+            if dx != 0 and dy != 0:
+                ok &= (tiles[cy, nxc] == TILE_EMPTY) & (tiles[nyc, cx] == TILE_EMPTY)
+            best_x = np.where(ok, nx, best_x)
+            best_y = np.where(ok, ny, best_y)
+            best_value = np.where(ok, value, best_value)
+
+        # 朝目标格中心移动
+        vx = best_x * TILE_SIZE + TILE_SIZE / 2 - xs
+        vy = best_y * TILE_SIZE + TILE_SIZE / 2 - ys
+        length = np.hypot(vx, vy)
+        valid = (current > 0) & (best_x >= 0) & (length > 0)
+        safe = np.where(valid, length, 1.0)
+        ux = np.where(valid, vx / safe, 0.0)
+        uy = np.where(valid, vy / safe, 0.0)
+        return ux, uy, valid
@@ -0,0 +1,193 @@
+"""
+分阶段帧耗时统计：记录每帧各阶段（事件、移动、怪物 AI、小点、碰撞、
+地图绘制、实体绘制、HUD、显示翻转）的耗时，保留最近若干帧，
+叠加显示滚动的堆叠耗时图、各阶段 p50/p95/p99 和 count() 记录的计数器
+
+关闭时 mark()/lap() 直接返回，不读取时钟，开销可以忽略
+用法：
+    mark = profiler.mark()
+    ...                               # 阶段代码
+    mark = profiler.lap("movement", mark)
+    ...
+    profiler.end_frame()              # 每帧结束时调用一次
+"""
+import time
+
+import numpy as np
+import pygame
+
+# 阶段名（显示顺序即堆叠顺序）与颜色
+STAGES = ("events", "movement", "monster_ai", "projectiles", "collision",
+          "map_render", "entities", "hud", "flip")
+STAGE_COLORS = {
+    "events": (200, 200, 200),
+    "movement": (80, 160, 255),
+    "monster_ai": (255, 90, 90),
+    "projectiles": (255, 160, 60),
+    "collision": (255, 230, 80),
+    "map_render": (80, 220, 120),
+    "entities": (60, 200, 200),
+    "hud": (200, 120, 255),
+    "flip": (140, 140, 140),
+}
+
+HISTORY_FRAMES = 240            # 保留的帧数（也是耗时图宽度，像素）
+GRAPH_HEIGHT = 100              # 耗时图高度（像素）
+GRAPH_RANGE_MS = 1000 / 30      # 耗时图满刻度：两个 60 FPS 帧预算
+BUDGET_MS = 1000 / 60           # 60 FPS 帧预算线
+TEXT_REFRESH_FRAMES = 15        # 百分位文字的刷新间隔（帧）
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    """帧耗时统计，enabled 为假时所有记录方法都是空操作"""
+
+    def __init__(self, enabled=False, history=HISTORY_FRAMES):
+        self.history = history
+        self._stage_index = {name: i for i, name in enumerate(STAGES)}
+        # 每行一帧：各阶段耗时 + 整帧耗时（毫秒）
+        self.samples = np.zeros((history, len(STAGES) + 1))
+        self._current = [0.0] * len(STAGES)
+        self.frames = 0
+        self._frame_start = None
+        self._graph = None
+        self._panel = None
+        self._rows = []
+        # 计数器（名称 -> 当前值），显示在百分位表下方
+        self.counters = {}
+        self.enabled = False
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        """开关统计；重新开启时清空旧数据"""
+        if enabled and not self.enabled:
+            self.samples[:] = 0
+            self._current = [0.0] * len(STAGES)
+            self.frames = 0
+            self._frame_start = None
+            self._graph = None
+            self._rows = []
+            self.counters = {}
+        self.enabled = enabled
+
+    # ---------------- 记录 ----------------
+
+    def mark(self):
+        """当前时间点（关闭时为 0）"""
+        if not self.enabled:
+            return 0.0
+        return time.perf_counter()
+
+    def lap(self, stage, mark):
+        """把 mark 到现在的耗时计入 stage（同一帧内可多次累加），返回新的时间点"""
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        self._current[self._stage_index[stage]] += (now - mark) * 1000
+        return now
+
+    def count(self, name, value):
+        """记录计数器的当前值（如局部/整屏提交帧数），关闭时不记录"""
+        if self.enabled:
+            self.counters[name] = value
+
+    def end_frame(self):
+        """结束一帧：保存本帧各阶段耗时和距上一帧结束的整帧耗时"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        current = self._current
+        total = sum(current) if self._frame_start is None else (now - self._frame_start) * 1000
+        self._frame_start = now
+
+        row = self.samples[self.frames % self.history]
+        row[:-1] = current
+        row[-1] = total
+        self._current = [0.0] * len(STAGES)
+        self.frames += 1
+        if self._graph is not None:
+            self._draw_graph_column(current)
+        if self.frames % TEXT_REFRESH_FRAMES == 0:
+            self._rows = []
+
+    # ---------------- 统计 ----------------
+
+    def percentiles(self):
+        """最近若干帧的百分位，形状为 (len(PERCENTILES), 阶段数 + 1)，最后一列为整帧"""
+        window = self.samples[:min(self.frames, self.history)]
+        if len(window) == 0:
+            return np.zeros((len(PERCENTILES), len(STAGES) + 1))
+        return np.percentile(window, PERCENTILES, axis=0)
+
+    def summary(self):
+        """{阶段: {"p50": 毫秒, "p95": ..., "p99": ...}}，frame 一项为整帧耗时"""
+        table = self.percentiles()
+        names = STAGES + ("frame",)
+        return {name: {f"p{p}": round(float(table[k, i]), 3) for k, p in enumerate(PERCENTILES)}
+                for i, name in enumerate(names)}
+
+    # ---------------- 绘制 ----------------
+
+    def _draw_graph_column(self, stage_ms):
+        """耗时图左移一像素，在最右列画本帧的堆叠耗时"""
+        graph = self._graph
+        graph.scroll(-1, 0)
+        x = self.history - 1
+        graph.fill((0, 0, 0, 170), (x, 0, 1, GRAPH_HEIGHT))
+        scale = GRAPH_HEIGHT / GRAPH_RANGE_MS
+        bottom = GRAPH_HEIGHT
+        for name, ms in zip(STAGES, stage_ms):
+            height = int(round(ms * scale))
+            if height <= 0:
+                continue
+            top = max(bottom - height, 0)
+            graph.fill(STAGE_COLORS[name], (x, top, 1, bottom - top))
+            bottom = top
+            if bottom == 0:
+                break
+
+    def _render_rows(self, font):
+        table = self.percentiles()
+        header = f"{'stage':<12}{'p50':>7}{'p95':>7}{'p99':>7}  ms"
+        rows = [(font.render(header, True, (255, 255, 255)), None)]
+        names = STAGES + ("frame",)
+        for i, name in enumerate(names):
+            text = f"{name:<12}" + "".join(f"{table[k, i]:7.2f}" for k in range(len(PERCENTILES)))
+            color = STAGE_COLORS.get(name, (255, 255, 255))
+            rows.append((font.render(text, True, (230, 230, 230)), color))
+        for name, value in self.counters.items():
+            rows.append((font.render(f"{name:<21}{value:>10}", True, (200, 200, 200)), None))
+        self._rows = rows
+
+    def draw(self, screen, font, pos=None):
+        """在屏幕右上角（或 pos）绘制耗时图和百分位表，返回面板区域"""
+        if not self.enabled:
+            return None
+        if self._graph is None:
+            self._graph = pygame.Surface((self.history, GRAPH_HEIGHT), pygame.SRCALPHA)
+            self._graph.fill((0, 0, 0, 170))
+        if not self._rows:
+            self._render_rows(font)
+
+        line_height = font.get_linesize()
+        width = max(self.history, max(surface.get_width() for surface, _ in self._rows) + 14)
+        height = GRAPH_HEIGHT + 6 + line_height * len(self._rows)
+        if pos is None:
+            pos = (screen.get_width() - width - 10, 10)
+        x, y = pos
+
+        if self._panel is None or self._panel.get_size() != (width + 8, height + 8):
+            self._panel = pygame.Surface((width + 8, height + 8), pygame.SRCALPHA)
+            self._panel.fill((0, 0, 0, 150))
+        panel_rect = screen.blit(self._panel, (x - 4, y - 4))
+        screen.blit(self._graph, (x, y))
+        budget_y = y + GRAPH_HEIGHT - int(BUDGET_MS * GRAPH_HEIGHT / GRAPH_RANGE_MS)
+        pygame.draw.line(screen, (255, 255, 255), (x, budget_y), (x + self.history - 1, budget_y))
+
+        y += GRAPH_HEIGHT + 6
+        for surface, color in self._rows:
+            if color is not None:
+                pygame.draw.rect(screen, color, (x, y + line_height // 2 - 4, 8, 8))
+            screen.blit(surface, (x + 14, y))
+            y += line_height
+        return panel_rect
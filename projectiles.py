@@ -0,0 +1,168 @@
+"""
+全局小点系统：所有怪物发射的小点保存在预分配的数组池中
+（位置、速度、发射者、剩余寿命、存活范围），批量移动、命中检测和绘制；
+移除时把末尾的小点换到空位，不产生内存分配
+"""
+import numpy as np
+import pygame
+
+PROJECTILE_RADIUS = 5
+PROJECTILE_SPEED = 2
+PROJECTILE_COLOR = (255, 0, 0)
+PROJECTILE_MARGIN = 100     # 飞出所属房间多远后移除
+PROJECTILE_LIFETIME = 600   # 最长存活帧数
+PROJECTILE_CAPACITY = 1024  # 初始容量，用满时翻倍
+
+
+class ProjectileSystem:
+    """小点数组池，前 count 个槽位为存活的小点"""
+
+    FIELDS = {
+        "x": (np.float64, ()),
+        "y": (np.float64, ()),
+        "vx": (np.float64, ()),
+        "vy": (np.float64, ()),
+        "owner": (np.int32, ()),
+        "life": (np.int32, ()),
+        "limits": (np.float64, (4,)),  # 存活范围 (left, top, right, bottom)
+    }
+
+    def __init__(self, capacity=PROJECTILE_CAPACITY, radius=PROJECTILE_RADIUS, color=PROJECTILE_COLOR):
+        self.count = 0
+        self.capacity = 0
+        self.radius = radius
+        self._reserve(capacity)
+        # 预渲染的小点精灵，绘制时批量 blit
+        self.sprite = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+        pygame.draw.circle(self.sprite, color, (radius, radius), radius)
+
+    def __len__(self):
+        return self.count
+
+    def _reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        for name, (dtype, shape) in self.FIELDS.items():
+            grown = np.zeros((capacity,) + shape, dtype=dtype)
+            if self.capacity:
+                grown[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, grown)
+        self.capacity = capacity
+
+    def clear(self):
+        self.count = 0
+
+    # ---------------- 发射 ----------------
+
+    def fire(self, xs, ys, target_x, target_y, owners, bounds, pattern=1, spread=0.3,
+             speed=PROJECTILE_SPEED, lifetime=PROJECTILE_LIFETIME):
+        """
+        从每个发射点朝目标发射 pattern 个小点（相邻夹角 spread 弧度的扇形）
+        bounds 为发射者房间的像素边界，小点飞出边界外 PROJECTILE_MARGIN 后移除
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        if xs.size == 0:
+            return
+        ys = np.asarray(ys, dtype=np.float64)
+        angles = np.arctan2(target_y - ys, target_x - xs)
+        offsets = (np.arange(pattern) - (pattern - 1) / 2) * spread
+        angles = (angles[:, None] + offsets[None, :]).ravel()
+
+        added = angles.size
+        start = self.count
+        end = start + added
+        if end > self.capacity:
+            self._reserve(max(end, self.capacity * 2))
+        self.x[start:end] = np.repeat(xs, pattern)
+        self.y[start:end] = np.repeat(ys, pattern)
+        self.vx[start:end] = np.cos(angles) * speed
+        self.vy[start:end] = np.sin(angles) * speed
+        self.owner[start:end] = np.repeat(owners, pattern)
+        self.life[start:end] = lifetime
+        limits = np.asarray(bounds, dtype=np.float64) + (-PROJECTILE_MARGIN, -PROJECTILE_MARGIN,
+                                                         PROJECTILE_MARGIN, PROJECTILE_MARGIN)
+        self.limits[start:end] = np.repeat(limits, pattern, axis=0)
+        self.count = end
+
+    # ---------------- 更新 ----------------
+
+    def update(self):
+        """移动所有小点，移除寿命耗尽或飞出范围的小点"""
+        n = self.count
+        if n == 0:
+            return
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.life[:n] -= 1
+        limits = self.limits[:n]
+        keep = ((self.life[:n] > 0) &
+                (limits[:, 0] <= self.x[:n]) & (self.x[:n] <= limits[:, 2]) &
+                (limits[:, 1] <= self.y[:n]) & (self.y[:n] <= limits[:, 3]))
+        self._swap_remove(keep)
+
+    def hit_test(self, x, y, radius):
+        """移除与 (x, y) 距离小于 radius + 小点半径的小点，返回命中数量"""
+        n = self.count
+        if n == 0:
+            return 0
+        reach = radius + self.radius
+        hit = (self.x[:n] - x) ** 2 + (self.y[:n] - y) ** 2 < reach * reach
+        hits = int(np.count_nonzero(hit))
+        if hits:
+            self._swap_remove(~hit)
+        return hits
+
+    def remove_owner(self, owner):
+        """移除某个发射者的全部小点（怪物死亡时）"""
+        n = self.count
+        if n:
+            self._swap_remove(self.owner[:n] != owner)
+
+    def counts(self, owners):
+        """每个发射者在场的小点数"""
+        owners = np.asarray(owners, dtype=np.intp)
+        if owners.size == 0:
+            return np.zeros(0, dtype=np.intp)
+        counts = np.bincount(self.owner[:self.count], minlength=int(owners.max()) + 1)
+        return counts[owners]
+
+    def _swap_remove(self, keep):
+        """删除 keep 为假的槽位：用末尾存活的小点填补前面的空位"""
+        n = self.count
+        new_count = int(np.count_nonzero(keep))
+        if new_count == n:
+            return
+        holes = np.flatnonzero(~keep[:new_count])
+        movers = np.flatnonzero(keep[new_count:]) + new_count
+        for name in self.FIELDS:
+            array = getattr(self, name)
+            array[holes] = array[movers]
+        self.count = new_count
+
+    # ---------------- 绘制 ----------------
+
+    def draw(self, screen, camera_x, camera_y, alpha=1.0):
+        """
+        只绘制屏幕范围内的小点，一次 blits 提交；
+        alpha 为渲染插值系数，小点匀速运动，按速度回退到两步之间的位置
+        返回所有可见小点的外接矩形（没有可见小点时为 None）
+        """
+        n = self.count
+        if n == 0:
+            return None
+        r = self.radius
+        back = 1.0 - alpha
+        sx = (self.x[:n] - self.vx[:n] * back - camera_x - r).astype(np.int32)
+        sy = (self.y[:n] - self.vy[:n] * back - camera_y - r).astype(np.int32)
+        width, height = screen.get_size()
+        visible = np.flatnonzero((sx > -2 * r) & (sx < width) & (sy > -2 * r) & (sy < height))
+        if visible.size == 0:
+            return None
+        sprite = self.sprite
+        xs = sx[visible]
+        ys = sy[visible]
+        screen.blits([(sprite, (x, y)) for x, y in zip(xs.tolist(), ys.tolist())], doreturn=False)
+        left = int(xs.min())
+        top = int(ys.min())
+        size = 2 * r + 1
+        return pygame.Rect(left, top, int(xs.max()) - left + size, int(ys.max()) - top + size)
@@ -0,0 +1,284 @@
+"""
+输入录制与回放：每个模拟步的输入编码为一个字节，按关卡分段保存
+（关卡种子 + 输入的游程编码 + 段末状态摘要），回放时用同一种子重新生成关卡、
+逐步喂入输入，结果逐位一致，可在无界面下不限速运行并校验摘要
+
+文件格式（小端）：
+    头部  4s 魔数 | B 版本 | H 模拟频率 | I 段数
+    每段  I 种子 | H 地图宽 | H 地图高 | I 步数 | I 游程数
+          游程数 × (B 输入字节, 变长整数 重复次数)
+          16s 段末状态摘要
+
+用法示例：
+    python main.py --record session.drpl
+    python replay.py session.drpl
+    python replay.py session.drpl --render --repeat 5
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import struct
+import sys
+import time
+
+from game_engine import SIM_HZ
+from level_pool import generate_level
+
+MAGIC = b"DRPL"
+FORMAT_VERSION = 1
+DIGEST_SIZE = 16
+HEADER = struct.Struct("<4sBHI")
+SEGMENT = struct.Struct("<IHHII")
+
+
+class ReplayError(Exception):
+    """回放文件损坏或与当前版本不兼容"""
+
+
+def state_digest(engine):
+    """模拟状态摘要：玩家、怪物和小点的位置与生命值（浮点按位参与计算）"""
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    player = engine.player
+    digest.update(struct.pack("<dddii", engine.sim_time, player.x, player.y,
+                              player.current_health, len(engine.monsters)))
+    digest.update(engine.state.encode("utf-8"))
+    store = engine.monster_store
+    for array in (store.x, store.y, store.health, store.alive):
+        digest.update(array[:store.count].tobytes())
+    projectiles = engine.projectiles
+    for array in (projectiles.x, projectiles.y):
+        digest.update(array[:projectiles.count].tobytes())
+    return digest.digest()
+
+
+# ---------------- 编码 ----------------
+
+def _encode_runs(inputs):
+    """游程编码：[(输入字节, 重复次数)]"""
+    runs = []
+    for value in inputs:
+        if runs and runs[-1][0] == value:
+            runs[-1][1] += 1
+        else:
+            runs.append([value, 1])
+    return runs
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError("Truncated replay file")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def save_replay(path, segments):
+    """保存录像；segments 为 {"seed", "width", "height", "inputs", "digest"} 列表"""
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, SIM_HZ, len(segments)))
+    for segment in segments:
+        runs = _encode_runs(segment["inputs"])
+        out += SEGMENT.pack(segment["seed"], segment["width"], segment["height"],
+                            len(segment["inputs"]), len(runs))
+        for value, count in runs:
+            out.append(value)
+            _write_varint(out, count)
+        out += segment["digest"].ljust(DIGEST_SIZE, b"\0")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def load_replay(path):
+    """读取录像，返回段列表"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ReplayError(f"Not a replay file: {path}")
+    magic, version, sim_hz, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ReplayError(f"Not a replay file: {path}")
+    if version != FORMAT_VERSION:
+        raise ReplayError(f"Unsupported replay version {version}")
+    if sim_hz != SIM_HZ:
+        raise ReplayError(f"Replay recorded at {sim_hz} Hz, simulation runs at {SIM_HZ} Hz")
+
+    pos = HEADER.size
+    segments = []
+    for _ in range(count):
+        if pos + SEGMENT.size > len(data):
+            raise ReplayError("Truncated replay file")
+        seed, width, height, ticks, run_count = SEGMENT.unpack_from(data, pos)
+        pos += SEGMENT.size
+        inputs = bytearray()
+        for _ in range(run_count):
+            if pos >= len(data):
+                raise ReplayError("Truncated replay file")
+            value = data[pos]
+            repeat, pos = _read_varint(data, pos + 1)
+            inputs += bytes((value,)) * repeat
+        if len(inputs) != ticks:
+            raise ReplayError("Replay segment length mismatch")
+        digest = data[pos:pos + DIGEST_SIZE]
+        pos += DIGEST_SIZE
+        segments.append({"seed": seed, "width": width, "height": height,
+                         "inputs": inputs, "digest": bytes(digest)})
+    return segments
+
+
+# ---------------- 录制 ----------------
+
+class InputRecorder:
+    """传给 GameEngine(recorder=...)：每关开始新的一段，每个模拟步记录一个输入字节"""
+
+    def __init__(self):
+        self.segments = []
+        self._engine = None
+
+    def begin_level(self, engine, level):
+        if level.seed is None:
+            raise ValueError("Cannot record a level without a seed")
+        self._finish_segment()
+        self.segments.append({"seed": level.seed, "width": level.map.width,
+                              "height": level.map.height, "inputs": bytearray(), "digest": b""})
+        self._engine = engine
+
+    def record(self, inputs):
+        self.segments[-1]["inputs"].append(inputs)
+
+    def _finish_segment(self):
+        """记下当前段末的状态摘要（此时引擎尚未载入下一关）"""
+        if self.segments and self._engine is not None:
+            self.segments[-1]["digest"] = state_digest(self._engine)
+
+    def save(self, path):
+        self._finish_segment()
+        save_replay(path, self.segments)
+
+
+# ---------------- 回放 ----------------
+
+class Replay:
+    """传给 GameEngine(replay=...)：按录像提供关卡和每步输入，并在段末校验状态摘要"""
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.ticks = 0
+        self.mismatches = []  # 摘要不一致的段号
+        self._segment = -1
+        self._tick = 0
+        self._verified = -1
+
+    @classmethod
+    def load(cls, path):
+        return cls(load_replay(path))
+
+    def next_level(self, engine):
+        """进入下一段：校验上一段的结果，并用录像中的种子重新生成关卡"""
+        self._verify(engine)
+        if self._segment + 1 >= len(self.segments):
+            raise ReplayError("Replay has no more levels")
+        self._segment += 1
+        self._tick = 0
+        segment = self.segments[self._segment]
+        return generate_level(segment["width"], segment["height"], seed=segment["seed"])
+
+    def next_input(self):
+        """当前段下一步的输入（段已结束时返回 0）"""
+        inputs = self.segments[self._segment]["inputs"]
+        if self._tick >= len(inputs):
+            return 0
+        value = inputs[self._tick]
+        self._tick += 1
+        self.ticks += 1
+        return value
+
+    @property
+    def segment_done(self):
+        return self._tick >= len(self.segments[self._segment]["inputs"])
+
+    @property
+    def has_next_level(self):
+        return self._segment + 1 < len(self.segments)
+
+    def finish(self, engine):
+        """回放结束：校验最后一段"""
+        self._verify(engine)
+
+    def _verify(self, engine):
+        if self._segment < 0 or self._verified >= self._segment:
+            return
+        self._verified = self._segment
+        if state_digest(engine) != self.segments[self._segment]["digest"]:
+            self.mismatches.append(self._segment)
+
+
+def run_replay(segments, render=False, engine_options=None):
+    """无界面不限速回放，返回 (Replay, 耗时秒数)"""
+    import headless
+    import pygame
+    from game_engine import GameEngine
+
+    screen = headless.init_headless()
+    font = pygame.font.Font(None, 24)
+    replay = Replay(segments)
+    engine = GameEngine(screen, font, replay=replay, **(engine_options or {}))
+
+    start = time.perf_counter()
+    while True:
+        if replay.segment_done:
+            if not replay.has_next_level:
+                break
+            # 录制时换了新游戏（而不是按 R 重开），由回放主动载入下一关
+            engine.load_level(replay.next_level(engine))
+            continue
+        engine.update()
+        if render:
+            engine.draw()
+    elapsed = time.perf_counter() - start
+    replay.finish(engine)
+    return replay, elapsed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="无界面不限速回放录像并校验结果")
+    parser.add_argument("replay", help="回放文件")
+    parser.add_argument("--render", action="store_true", help="每步也执行绘制")
+    parser.add_argument("--repeat", type=int, default=1, help="重复回放次数（性能测试）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    import headless
+
+    segments = load_replay(args.replay)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaders = headless.load_resources()
+
+    failed = False
+    for run in range(args.repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            replay, elapsed = run_replay(segments, args.render, loaders)
+        rate = replay.ticks / elapsed if elapsed > 0 else 0.0
+        status = "一致" if not replay.mismatches else f"不一致（段 {replay.mismatches}）"
+        print(f"回放 {run + 1}: {len(segments)} 段，{replay.ticks} 步，{elapsed:.2f}s，"
+              f"{rate:.0f} 步/秒，状态摘要{status}")
+        failed = failed or bool(replay.mismatches)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
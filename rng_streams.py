@@ -0,0 +1,29 @@
+"""
+按子系统划分的随机数流：一个关卡种子为地图生成、怪物生成等子系统
+各派生一个独立的 random.Random，子系统之间互不影响，同一种子结果完全可复现
+"""
+import random
+
+# 种子范围（存档/回放中按 32 位无符号整数保存）
+SEED_BITS = 32
+
+
+def new_seed():
+    """取一个新的随机种子（不消耗任何子系统的随机数流）"""
+    return random.SystemRandom().getrandbits(SEED_BITS)
+
+
+class RngStreams:
+    """按名称取子系统随机数流，如 streams.stream("map")"""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self._streams = {}
+
+    def stream(self, name):
+        rng = self._streams.get(name)
+        if rng is None:
+            # 字符串种子经 SHA-512 派生，与进程和平台无关
+            rng = random.Random(f"{self.seed}:{name}")
+            self._streams[name] = rng
+        return rng
@@ -0,0 +1,96 @@
+"""
+均匀网格空间哈希：按像素坐标把实体分到固定大小的格子里，
+碰撞和攻击判定只检查附近格子中的实体
+"""
+from map import TILE_SIZE
+
+# 默认格子边长（像素）：4 个地砖，约等于怪物精灵大小
+CELL_SIZE = TILE_SIZE * 4
+
+
+class SpatialHash:
+    """实体空间哈希，实体移动时调用 update 维护所在格子"""
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        # 格子 -> {实体: None}（用 dict 保持插入顺序，结果可复现）
+        self._cells = {}
+        # 实体 -> (x, y, 格子)
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, obj):
+        return obj in self._entries
+
+    def _cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, obj, x, y):
+        """加入实体（已存在时等同于 update）"""
+        if obj in self._entries:
+            self.update(obj, x, y)
+            return
+        cell = self._cell_of(x, y)
+        self._cells.setdefault(cell, {})[obj] = None
+        self._entries[obj] = (x, y, cell)
+
+    def update(self, obj, x, y):
+        """更新实体位置，只有跨格时才移动桶"""
+        entry = self._entries.get(obj)
+        if entry is None:
+            self.insert(obj, x, y)
+            return
+        cell = self._cell_of(x, y)
+        if cell != entry[2]:
+            bucket = self._cells[entry[2]]
+            del bucket[obj]
+            if not bucket:
+                del self._cells[entry[2]]
+            self._cells.setdefault(cell, {})[obj] = None
+        self._entries[obj] = (x, y, cell)
+
+    def remove(self, obj):
+        """移除实体（不存在时忽略）"""
+        entry = self._entries.pop(obj, None)
+        if entry is None:
+            return
+        bucket = self._cells[entry[2]]
+        del bucket[obj]
+        if not bucket:
+            del self._cells[entry[2]]
+
+    def clear(self):
+        self._cells.clear()
+        self._entries.clear()
+
+    def query_rect(self, left, top, right, bottom):
+        """返回位置落在矩形 [left, right] x [top, bottom] 内的实体"""
+        min_cx, min_cy = self._cell_of(left, top)
+        max_cx, max_cy = self._cell_of(right, bottom)
+        entries = self._entries
+        found = []
+        for cy in range(min_cy, max_cy + 1):
+            for cx in range(min_cx, max_cx + 1):
+                bucket = self._cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for obj in bucket:
+                    x, y, _ = entries[obj]
+                    if left <= x <= right and top <= y <= bottom:
+                        found.append(obj)
+        return found
+
+    def query_radius(self, x, y, radius):
+        """返回与 (x, y) 距离小于 radius 的实体，按距离由近到远排序"""
+        radius_sq = radius * radius
+        entries = self._entries
+        found = []
+        for obj in self.query_rect(x - radius, y - radius, x + radius, y + radius):
+            ox, oy, _ = entries[obj]
+            dist_sq = (ox - x) ** 2 + (oy - y) ** 2
+            if dist_sq < radius_sq:
+                found.append((dist_sq, len(found), obj))
+        found.sort()
+        return [obj for _, _, obj in found]
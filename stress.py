@@ -0,0 +1,237 @@
+"""
+压力测试：在地牢中按数量生成近战/远程怪物并维持一场小点风暴，
+按实体数量自动扫描，记录每个数量下的帧耗时（含各阶段），
+找出帧耗时开始随实体数急剧上升的拐点和超出 60 FPS 预算的数量
+
+布局：
+    spread  怪物随机分布在所有房间（正常调度，远处的怪物休眠）
+    crowd   怪物全部挤在玩家所在房间（全部激活追击，最坏情况）
+
+用法示例：
+    python stress.py --counts 0,500,1000,2000,4000,8000 -o stress.json
+    python stress.py --layout crowd --counts 100,200,400,800 --projectile-ratio 2
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import random
+import sys
+
+import headless  # 设置 SDL dummy 驱动，需在 pygame 之前导入
+import numpy as np
+import pygame
+
+from game_engine import GameEngine, SIM_STEP_MS
+from level_pool import SeededLevels
+from map import TILE_SIZE
+from monster_store import RANGED_TYPES
+from profiler import BUDGET_MS, FrameProfiler
+
+DEFAULT_COUNTS = (0, 250, 500, 1000, 2000, 4000, 8000)
+LAYOUTS = ("spread", "crowd")
+# 小点风暴的发射点距玩家的最大距离（像素），约半个屏幕
+STORM_RADIUS = 400
+# 每增加一个实体的耗时超过起始斜率的该倍数时视为拐点
+KNEE_SLOPE_FACTOR = 2.0
+
+
+# ---------------- 场景生成 ----------------
+
+def populate(engine, monsters, ranged_ratio=0.5, layout="spread", rng=None):
+    """
+    按 ranged_ratio 的比例生成 monsters 个远程/近战怪物，
+    位置在房间内部随机分布；返回生成的怪物列表
+    """
+    rng = random if rng is None else rng
+    types = engine.monster_types() if monsters else []
+    ranged_types = [t for t in types if t in RANGED_TYPES]
+    melee_types = [t for t in types if t not in RANGED_TYPES]
+    rooms = engine.map.rooms
+    if layout == "crowd":
+        rooms = [rooms[engine.player_room]]
+
+    spawned = []
+    for _ in range(monsters):
+        pool = ranged_types if rng.random() < ranged_ratio else melee_types
+        room = rng.choice(rooms)
+        monster_type = rng.choice(pool or types)
+        # 房间内部的随机位置（避开墙边一格）
+        x = (room["x"] + 1 + rng.random() * max(room["width"] - 2, 0)) * TILE_SIZE
+        y = (room["y"] + 1 + rng.random() * max(room["height"] - 2, 0)) * TILE_SIZE
+        spawned.append(engine.spawn_monster(monster_type, room, x, y))
+
+    if engine.player_room >= 0:
+        engine.activity.wake_room(engine.player_room)
+    return spawned
+
+
+def storm(engine, target, rng=None):
+    """
+    把场上小点补足到 target 个：从玩家周围 STORM_RADIUS 内的随机点朝玩家发射，
+    存活范围为整张地图；发射者取玩家附近的怪物（附近没有时任取），
+    以免远处怪物因名下有小点而一直不能休眠
+    """
+    projectiles = engine.projectiles
+    missing = target - projectiles.count
+    store = engine.monster_store
+    if missing <= 0 or store.count == 0:
+        return
+    rng = random if rng is None else rng
+    player = engine.player
+    nearby = engine.monster_hash.query_radius(player.x, player.y, STORM_RADIUS)
+    owners = [m.index for m in (nearby or engine.monsters)]
+    if not owners:
+        return
+    xs, ys, shooters = [], [], []
+    for _ in range(missing):
+        distance = STORM_RADIUS * (0.3 + 0.7 * rng.random())
+        angle = rng.random() * 2 * math.pi
+        xs.append(player.x + distance * math.cos(angle))
+        ys.append(player.y + distance * math.sin(angle))
+        shooters.append(rng.choice(owners))
+    bounds = np.tile((0, 0, engine.map.width * TILE_SIZE, engine.map.height * TILE_SIZE), (missing, 1))
+    projectiles.fire(xs, ys, player.x, player.y, shooters, bounds)
+
+
+# ---------------- 扫描 ----------------
+
+def run_scene(loaders, monsters, ticks=300, warmup=60, seed=0, ranged_ratio=0.5,
+              projectile_ratio=0.5, layout="spread", policy=headless.random_policy, render=True):
+    """生成一个压力场景并运行 warmup + ticks 步，返回帧耗时统计"""
+    screen = headless.init_headless()
+    random.seed(seed)
+    rng = random.Random(seed)
+    controls = headless.ScriptedInput()
+    profiler = FrameProfiler(enabled=False, history=max(ticks, 1))
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = GameEngine(screen, pygame.font.Font(None, 24), level_pool=SeededLevels(seed),
+                            input_source=controls, profiler=profiler, **loaders)
+        populate(engine, monsters, ranged_ratio, layout, rng)
+    # 玩家无敌，保证整段测量都在模拟战斗
+    engine.player.current_health = 10 ** 9
+    storm_target = int(round(monsters * projectile_ratio))
+
+    projectile_total = 0
+    awake_total = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for tick in range(warmup + ticks):
+            if tick == warmup:
+                profiler.set_enabled(True)
+            policy(engine, controls)
+            mark = profiler.mark()
+            engine.handle_events(controls.drain_events())
+            mark = profiler.lap("events", mark)
+            storm(engine, storm_target, rng)
+            profiler.lap("projectiles", mark)
+            engine.update(SIM_STEP_MS)
+            if render:
+                engine.draw()
+            profiler.end_frame()
+            if tick >= warmup:
+                projectile_total += engine.projectiles.count
+                awake_total += engine.activity.awake_count
+
+    summary = profiler.summary()
+    return {
+        "monsters": monsters,
+        "total_monsters": len(engine.monsters),  # 含关卡本身每个房间的一个怪物
+        "ranged": sum(1 for m in engine.monsters if m.is_ranged),
+        "projectile_target": storm_target,
+        "avg_projectiles": projectile_total / max(ticks, 1),
+        "avg_awake_monsters": awake_total / max(ticks, 1),
+        "entities": monsters + storm_target,
+        "frame_ms": summary.pop("frame"),
+        "stages_ms": summary,
+        "state": engine.state,
+    }
+
+
+def find_knee(points):
+    """
+    points 为按实体数排序的 (实体数, 帧耗时 p50)；以前两点的每实体耗时为起始斜率，
+    返回之后第一个区间斜率超过其 KNEE_SLOPE_FACTOR 倍的区间终点实体数（没有时为 None）
+    """
+    slopes = []
+    for (n0, t0), (n1, t1) in zip(points, points[1:]):
+        if n1 > n0:
+            slopes.append((n1, (t1 - t0) / (n1 - n0)))
+    if len(slopes) < 2:
+        return None
+    base = max(slopes[0][1], 1e-6)
+    for n, slope in slopes[1:]:
+        if slope > base * KNEE_SLOPE_FACTOR:
+            return n
+    return None
+
+
+def sweep(counts=DEFAULT_COUNTS, **scene_options):
+    """依次运行每个怪物数量，返回 {"scenes": [...], "knee_entities", "over_budget_entities"}"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaders = headless.load_resources()
+    scenes = []
+    for count in counts:
+        scene = run_scene(loaders, count, **scene_options)
+        scenes.append(scene)
+        frame = scene["frame_ms"]
+        print(f"怪物 {count:>6}  小点 {scene['avg_projectiles']:8.0f}  唤醒 {scene['avg_awake_monsters']:7.0f}  "
+              f"帧耗时 p50 {frame['p50']:7.2f} ms  p95 {frame['p95']:7.2f} ms  p99 {frame['p99']:7.2f} ms",
+              file=sys.stderr)
+
+    points = sorted((s["entities"], s["frame_ms"]["p50"]) for s in scenes)
+    over_budget = [s["entities"] for s in scenes if s["frame_ms"]["p95"] > BUDGET_MS]
+    return {
+        "scenes": scenes,
+        "knee_entities": find_knee(points),
+        "over_budget_entities": min(over_budget) if over_budget else None,
+    }
+
+
+def parse_counts(text):
+    return [int(part) for part in text.split(",") if part.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="实体数量压力测试：扫描怪物/小点数量并记录帧耗时")
+    parser.add_argument("--counts", type=parse_counts, default=list(DEFAULT_COUNTS),
+                        help="逗号分隔的怪物数量列表")
+    parser.add_argument("--ranged-ratio", type=float, default=0.5, help="远程怪物比例")
+    parser.add_argument("--projectile-ratio", type=float, default=0.5,
+                        help="小点风暴规模（怪物数的倍数，每步补足）")
+    parser.add_argument("--layout", choices=LAYOUTS, default="spread", help="怪物分布方式")
+    parser.add_argument("--policy", choices=sorted(headless.POLICIES), default="random", help="玩家输入策略")
+    parser.add_argument("--ticks", type=int, default=300, help="每个数量测量的模拟步数")
+    parser.add_argument("--warmup", type=int, default=60, help="测量前预热的模拟步数")
+    parser.add_argument("--seed", type=int, default=0, help="关卡与场景的随机种子")
+    parser.add_argument("--no-render", action="store_true", help="只测模拟，不绘制")
+    parser.add_argument("-o", "--output", default="-", help="输出 JSON 文件（默认标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = sweep(args.counts, ticks=args.ticks, warmup=args.warmup, seed=args.seed,
+                   ranged_ratio=args.ranged_ratio, projectile_ratio=args.projectile_ratio,
+                   layout=args.layout, policy=headless.POLICIES[args.policy],
+                   render=not args.no_render)
+    result["options"] = {
+        "layout": args.layout, "ranged_ratio": args.ranged_ratio,
+        "projectile_ratio": args.projectile_ratio, "policy": args.policy,
+        "ticks": args.ticks, "seed": args.seed, "render": not args.no_render,
+    }
+    print(f"拐点：{result['knee_entities']} 个实体；p95 超出 60 FPS 预算：{result['over_budget_entities']} 个实体",
+          file=sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        json.dump(result, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+文字渲染缓存：字体光栅化（尤其是中文 TrueType 字体）很慢，
+不变的文字渲染一次后放进 LRU 缓存；每帧变化的数字由预渲染的字形图集拼出，
+一行 HUD 只需几次 blit，不再每帧重新光栅化整行文字
+"""
+import re
+from collections import OrderedDict
+
+import pygame
+
+# 由字形图集拼出的字符（数字部分），其余文字按段走 LRU 缓存
+ATLAS_CHARS = "0123456789-."
+TEXT_CACHE_SIZE = 256
+_RUNS = re.compile(f"[{re.escape(ATLAS_CHARS)}]+|[^{re.escape(ATLAS_CHARS)}]+")
+
+
+def _display_format(surface):
+    """转换为与屏幕相同的像素格式，blit 更快（还没有显示窗口时保持原样）"""
+    if pygame.display.get_surface() is None:
+        return surface
+    return surface.convert_alpha()
+
+
+class GlyphAtlas:
+    """把 ATLAS_CHARS 的每个字符渲染进一张表面，记录各字符的区域"""
+
+    def __init__(self, font, color, antialias=True, chars=ATLAS_CHARS):
+        glyphs = [font.render(ch, antialias, color) for ch in chars]
+        width = sum(glyph.get_width() for glyph in glyphs)
+        height = max(glyph.get_height() for glyph in glyphs)
+        surface = pygame.Surface((max(width, 1), max(height, 1)), pygame.SRCALPHA)
+        self.areas = {}
+        x = 0
+        for ch, glyph in zip(chars, glyphs):
+            # 直接拷贝像素（含透明度），不与透明底色混合
+            surface.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.areas[ch] = pygame.Rect(x, 0, glyph.get_width(), glyph.get_height())
+            x += glyph.get_width()
+        self.surface = _display_format(surface)
+
+
+class TextCache:
+    """一个字体的文字缓存：render() 取整段文字，draw() 按段拼出含数字的一行"""
+
+    def __init__(self, font, capacity=TEXT_CACHE_SIZE):
+        self.font = font
+        self.capacity = capacity
+        self._surfaces = OrderedDict()
+        self._atlases = {}
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, color, antialias=True):
+        """与 font.render 相同，结果按 (文字, 颜色, 抗锯齿) 缓存（最近最少使用淘汰）"""
+        key = (text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = _display_format(self.font.render(text, antialias, color))
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.capacity:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def _atlas(self, color, antialias):
+        key = (tuple(color), antialias)
+        atlas = self._atlases.get(key)
+        if atlas is None:
+            atlas = GlyphAtlas(self.font, color, antialias)
+            self._atlases[key] = atlas
+        return atlas
+
+    def draw(self, screen, text, pos, color, antialias=True):
+        """
+        在 pos（左上角）绘制一行文字：数字段逐字取自字形图集，其余各段取自缓存，
+        一次 blits 提交；返回绘制区域
+        """
+        atlas = self._atlas(color, antialias)
+        x, y = pos
+        blits = []
+        height = 0
+        for run in _RUNS.findall(text):
+            if run[0] in atlas.areas:
+                for ch in run:
+                    area = atlas.areas[ch]
+                    blits.append((atlas.surface, (x, y), area))
+                    x += area.width
+                height = max(height, atlas.surface.get_height())
+            else:
+                surface = self.render(run, color, antialias)
+                blits.append((surface, (x, y)))
+                x += surface.get_width()
+                height = max(height, surface.get_height())
+        screen.blits(blits, doreturn=False)
+        return pygame.Rect(pos[0], pos[1], x - pos[0], height)